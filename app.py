@@ -4,13 +4,19 @@ Multi-user verification platform with document-based authentication
 """
 
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask.json.provider import DefaultJSONProvider
 import os
 from pathlib import Path
 from werkzeug.utils import secure_filename
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; jsonify falls back to Flask's encoder
+    orjson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -22,7 +28,48 @@ import crypto_utils
 import ai_verifier
 from blockchain import Blockchain
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() via orjson; database rows are already plain dicts, so result
+    lists encode in one native pass. orjson handles only the argument sets it
+    can reproduce exactly (Flask's compact and indent=2 layouts); anything
+    else, and non-ASCII output while ensure_ascii is set, goes to the stock
+    encoder. Unknown types and datetimes still go through default()"""
+
+    def _options(self, kwargs):
+        """orjson flags matching json.dumps(**kwargs), or None if there are none"""
+        if kwargs == {'separators': (',', ':')}:
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        elif kwargs == {'indent': 2}:
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_INDENT_2
+        else:
+            return None
+        return option | orjson.OPT_SORT_KEYS if self.sort_keys else option
+
+    def _dumpb(self, obj, kwargs):
+        option = self._options(kwargs)
+        if option is not None:
+            data = orjson.dumps(obj, default=self.default, option=option)
+            # orjson always writes raw UTF-8; escaping is left to json.dumps
+            if not self.ensure_ascii or data.isascii():
+                return data
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        return self._dumpb(obj, kwargs).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Same layout choice as DefaultJSONProvider.response
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args = {'indent': 2}
+        else:
+            dump_args = {'separators': (',', ':')}
+        return self._app.response_class(self._dumpb(obj, dump_args) + b'\n',
+                                        mimetype=self.mimetype)
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
 # Configuration
@@ -30,6 +77,7 @@ UPLOAD_FOLDER = Path(__file__).parent / 'uploads' / 'documents'
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+APPLICATIONS_PAGE_SIZE = 50
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
@@ -37,6 +85,15 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Initialize blockchain
 blockchain = Blockchain()
 
+# One database connection per request, handed back when the request ends
+@app.before_request
+def pin_db_connection():
+    db.pin_db()
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    db.unpin_db()
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -116,8 +173,7 @@ def practitioner_dashboard():
     user = auth.get_current_user()
     verifications = db.get_verifications_by_user(user['id'])
     active_credential = db.get_active_credential(user['id'])
-    appointments = db.get_appointments_by_user(user['id'], 'practitioner')
-    stats = db.get_practitioner_stats(user['id'])
+    stats, appointments = db.get_practitioner_dashboard(user['id'])
     
     return render_template('practitioner_dashboard.html',
                          verifications=verifications,
@@ -238,8 +294,9 @@ def upload_documents():
     days_remaining = 0
     
     if active_credential and active_credential['expires_at']:
-        expires_at = datetime.strptime(active_credential['expires_at'], '%Y-%m-%d %H:%M:%S.%f')
-        days_remaining = (expires_at - datetime.now()).days
+        # Stored timestamps are UTC
+        expires_at = datetime.fromisoformat(active_credential['expires_at']).replace(tzinfo=timezone.utc)
+        days_remaining = (expires_at - datetime.now(timezone.utc)).days
         if days_remaining > 7:
             upload_allowed = False
             
@@ -311,15 +368,15 @@ def analyze_verification(ver_id):
     doc_paths = [(doc['filepath'], doc['document_type']) for doc in documents]
     batch_result = ai_verifier.batch_analyze_documents(doc_paths)
     
-    # Update verification with AI results
-    db.update_verification_ai_analysis(
-        ver_id,
-        batch_result['average_score'],
-        batch_result
-    )
-    
-    # Update status
-    db.update_verification_status(ver_id, 'pending_org')
+    # Update verification with AI results and status in one transaction
+    with db.batch_writes() as conn:
+        db.update_verification_ai_analysis(
+            ver_id,
+            batch_result['average_score'],
+            batch_result,
+            conn=conn
+        )
+        db.update_verification_status(ver_id, 'pending_org', conn=conn)
     
     return jsonify({
         "success": True,
@@ -488,12 +545,11 @@ def org_submit_review(ver_id):
     if verdict not in ['approved', 'rejected']:
         return jsonify({"error": "Invalid verdict"}), 400
     
-    # Update verification
-    db.update_verification_org_review(ver_id, verdict, comments, user['id'])
-    
-    # If approved by org, move to pending admin
-    if verdict == 'approved':
-        db.update_verification_status(ver_id, 'pending_admin')
+    # Update verification; if approved by org, move to pending admin
+    with db.batch_writes() as conn:
+        db.update_verification_org_review(ver_id, verdict, comments, user['id'], conn=conn)
+        if verdict == 'approved':
+            db.update_verification_status(ver_id, 'pending_admin', conn=conn)
     
     return jsonify({
         "success": True,
@@ -512,28 +568,34 @@ def admin_dashboard():
     pending_admin = db.get_pending_admin_verifications()
     
     # Check and mark expired credentials
-    expired_count = db.check_expired_credentials()
+    expired_user_ids = db.check_expired_credentials()
     
     return render_template('admin_dashboard.html',
                          stats=stats,
                          pending_admin=pending_admin,
-                         expired_count=expired_count)
+                         expired_count=len(expired_user_ids))
 
 @app.route('/admin/applications')
 @auth.require_role('admin')
 def admin_applications():
     """Admin practitioner applications management"""
     status = request.args.get('status', 'pending')
-    applications = db.get_practitioner_applications(status)
+    before_ts = request.args.get('before')
+    before_id = request.args.get('before_id', type=int)
+    applications = db.get_practitioner_applications(status, before_ts, before_id,
+                                                    limit=APPLICATIONS_PAGE_SIZE)
+    # A full page means there may be older applications to page through
+    next_page = applications[-1] if len(applications) == APPLICATIONS_PAGE_SIZE else None
     return render_template('admin_applications.html', 
                          applications=applications,
-                         current_status=status)
+                         current_status=status,
+                         next_page=next_page)
 
 @app.route('/admin/users')
 @auth.require_role('admin')
 def admin_users():
     """Admin user management"""
-    users = db.get_all_users_safe()
+    users = db.iter_all_users_safe()
     return render_template('admin_users.html', users=users)
 
 @app.route('/admin/review/<int:ver_id>')
@@ -574,11 +636,6 @@ def admin_approve(ver_id):
     if not verification:
         return jsonify({"error": "Verification not found"}), 404
     
-    # Update verification with admin approval
-    db.update_verification_admin_decision(
-        ver_id, 'approved', comments, user['id'], validity_months
-    )
-    
     # Issue blockchain credential
     user_info = db.get_user_by_id(verification['user_id'])
     credential_hash = blockchain.add_credential(
@@ -587,13 +644,18 @@ def admin_approve(ver_id):
         skill=user_info.get('practitioner_type', 'Healthcare Professional')
     )
     
-    # Create credential record
-    db.create_credential(
-        verification_id=ver_id,
-        user_id=verification['user_id'],
-        blockchain_hash=credential_hash,
-        validity_months=validity_months
-    )
+    # Record the admin approval and the credential together
+    with db.batch_writes() as conn:
+        db.update_verification_admin_decision(
+            ver_id, 'approved', comments, user['id'], validity_months, conn=conn
+        )
+        db.create_credential(
+            verification_id=ver_id,
+            user_id=verification['user_id'],
+            blockchain_hash=credential_hash,
+            validity_months=validity_months,
+            conn=conn
+        )
     
     return jsonify({
         "success": True,
@@ -827,12 +889,10 @@ def patient_confirm_action():
             )
             
             # Update appointment with symptoms
-            conn = db.get_db()
-            cursor = conn.cursor()
-            cursor.execute('UPDATE appointments SET symptoms = ? WHERE id = ?', 
-                          (params.get('symptoms', ''), appt_id))
-            conn.commit()
-            conn.close()
+            with db.db_conn() as conn:
+                conn.execute('UPDATE appointments SET symptoms = ? WHERE id = ?', 
+                             (params.get('symptoms', ''), appt_id))
+                conn.commit()
             
             # Log action
             db.create_ai_action_log(patient_id, 'schedule_appointment', params, 'completed')
@@ -1050,7 +1110,7 @@ def organization_ai_assistant():
     
     # Build context
     pending_reviews = db.get_pending_org_verifications()
-    recent_vers = db.get_all_verifications()[:10]
+    recent_vers = db.get_all_verifications(limit=10)
     
     context = {
         'pending_reviews': pending_reviews,
@@ -0,0 +1,21 @@
+"""
+Pytest configuration
+
+The unittest suites (test_expansion.py, verify_admin_features.py) each build
+their own temporary database in setUp, so they can be sharded across workers
+when pytest-xdist is installed:
+
+    pytest -n auto --dist loadfile test_expansion.py verify_admin_features.py
+
+--dist loadfile keeps every test of a file on one worker.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_auto_num_workers(config):
+    """Size `-n auto` to the core count minus two, leaving room for the OS"""
+    return max((os.cpu_count() or 1) - 2, 1)
@@ -1,22 +1,273 @@
 """
 Database management for HealthCredX
 SQLite database with tables for users, documents, verifications, and credentials
+
+Record timestamps (created_at, updated_at, *_reviewed_at, last_login, ...) are
+UTC, stored as the 'YYYY-MM-DD HH:MM:SS' text that SQLite's CURRENT_TIMESTAMP
+produces; writers that only need "now" let SQL fill it in. The one exception
+is credentials.issued_at/expires_at, kept as epoch seconds so the expiry sweep
+and ordering compare integers; _format_epoch renders them in the same UTC text
+for display. Appointment date_time is the local wall-clock time of the visit.
 """
 
+import atexit
+import queue
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import json
 
+import auth
+import crypto_utils
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
 DB_PATH = Path(__file__).parent / 'data' / 'healthcredx.db'
 
-def get_db():
-    """Get database connection"""
+# Create the data directory once at import instead of on every connection
+try:
     DB_PATH.parent.mkdir(exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Access columns by name
+except OSError as e:
+    print(f"⚠ Could not create database directory {DB_PATH.parent}: {e}")
+
+# Per-connection prepared statement cache (sqlite3 default is 128), sized so
+# the module-level SQL constants stay compiled for the connection's lifetime
+STATEMENT_CACHE_SIZE = 256
+
+# Idle connections kept open for reuse by get_db()/release_db()
+POOL_SIZE = 8
+
+# Rows pulled per fetchmany() round trip by the iter_* generators
+ITER_BATCH_SIZE = 1000
+
+def _json_dumps(obj):
+    """Serialize to a JSON string, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+def _json_dumpb(obj):
+    """Serialize to UTF-8 JSON bytes (stored as a BLOB), skipping the decode"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+def _format_epoch(value):
+    """Render an epoch-seconds timestamp as UTC text; legacy text passes through"""
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+def _is_memory_db():
+    return str(DB_PATH) == ':memory:'
+
+class _Connection(sqlite3.Connection):
+    """Connection that remembers which database file it was opened on"""
+    db_path = None
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Per-thread read-only connections (see get_db_ro) and request pins (see pin_db)
+_tls = threading.local()
+
+# Database files already switched to WAL by this process
+_wal_paths = set()
+
+# (cursor.description, column names) of the last statement seen by
+# _dict_row. sqlite3 keeps handing out the same description tuple for a
+# statement's rows, so the names are built once per query, not once per row
+_row_columns = (None, ())
+
+def _dict_row(cursor, row):
+    """Row factory that builds each row directly as a plain dict"""
+    global _row_columns
+    description = cursor.description
+    cached, columns = _row_columns
+    if cached is not description:
+        columns = tuple(column[0] for column in description)
+        _row_columns = (description, columns)
+    return dict(zip(columns, row))
+
+def _configure(conn):
+    conn.db_path = str(DB_PATH)
+    conn.row_factory = _dict_row  # Rows come back as dicts, keyed by column
+    # Per-connection tuning, applied once when the pool opens the connection
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+    if not _is_memory_db():
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, factory=_Connection,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    _configure(conn)
+    # WAL lets readers run alongside the writer and batches fsyncs; the mode is
+    # stored in the database file, so it is set once per file, on the first
+    # read-write connection, whether or not init_db() runs in this process
+    if conn.db_path not in _wal_paths and not _is_memory_db():
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_paths.add(conn.db_path)
+    return conn
+
+def get_db():
+    """Get database connection from the pool (hand it back with release_db)"""
+    pinned = getattr(_tls, 'pinned', None)
+    if pinned is not None:
+        return pinned
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            return _connect()
+        if conn.db_path == str(DB_PATH):
+            return conn
+        conn.close()  # Opened before DB_PATH was repointed
+
+def release_db(conn):
+    """Return a connection to the pool, closing it if the pool is full"""
+    if conn is getattr(_tls, 'pinned', None):
+        return  # Held until unpin_db()
+    if conn.in_transaction:
+        conn.rollback()
+    if conn.db_path != str(DB_PATH):
+        conn.close()
+        return
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def pin_db():
+    """Pin one connection to this thread until unpin_db()
+
+    While pinned, every get_db() on the thread returns the same connection,
+    so a web request runs all its queries over one connection.
+    """
+    if getattr(_tls, 'pinned', None) is None:
+        _tls.pinned = get_db()
+
+def unpin_db():
+    """Return the thread's pinned connection to the pool"""
+    conn = getattr(_tls, 'pinned', None)
+    if conn is not None:
+        _tls.pinned = None
+        release_db(conn)
+
+def close_all():
+    """Close every idle pooled connection and this thread's read-only one"""
+    unpin_db()
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+    conn = getattr(_tls, 'ro', None)
+    if conn is not None:
+        _tls.ro = None
+        conn.close()
+
+atexit.register(close_all)
+
+@contextmanager
+def db_conn():
+    """Borrow a pooled connection for the duration of a with-block"""
+    conn = get_db()
+    try:
+        yield conn
+    finally:
+        release_db(conn)
+
+@contextmanager
+def batch_writes():
+    """Run several writes in one BEGIN IMMEDIATE transaction
+
+    Helpers that take a conn= argument join the batch instead of committing
+    on their own, so a whole view's writes share one commit and one fsync.
+    Taking the write lock up front means the batch can't fail halfway with
+    SQLITE_BUSY on lock upgrade. Rolls back if the block raises.
+    """
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()  # release_db won't for a pinned connection
+        raise
+    finally:
+        release_db(conn)
+
+def _execute_write(conn, query, params):
+    """Execute a write in the caller's batch, or in its own transaction"""
+    if conn is not None:
+        return conn.execute(query, params)
+    with db_conn() as own:
+        cursor = own.execute(query, params)
+        own.commit()
+    return cursor
+
+def get_db_ro():
+    """Get this thread's read-only connection
+
+    The connection stays open for the life of the thread, so callers must
+    not release or close it. With WAL it reads alongside pooled writers.
+    """
+    conn = getattr(_tls, 'ro', None)
+    if conn is not None and conn.db_path == str(DB_PATH):
+        return conn
+    if conn is not None:
+        conn.close()  # Opened before DB_PATH was repointed
+    conn = sqlite3.connect(f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", uri=True,
+                           factory=_Connection,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    _configure(conn)
+    conn.execute("PRAGMA query_only=1")
+    _tls.ro = conn
     return conn
 
+def _iter_rows(query, params=()):
+    """Yield rows in ITER_BATCH_SIZE batches
+
+    Memory stays bounded by one batch, and the pooled connection goes back
+    when the generator is exhausted or closed.
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = ITER_BATCH_SIZE
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        release_db(conn)
+
+def _add_missing_columns(cursor, table, columns):
+    """Add columns missing from an existing table; returns the names added"""
+    # table_xinfo also lists generated columns, which table_info hides
+    cursor.execute(f"PRAGMA table_xinfo({table})")
+    existing = {row['name'] for row in cursor.fetchall()}
+    added = []
+    for name, decl in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
 def init_db():
     """Initialize database with schema"""
     conn = get_db()
@@ -33,10 +284,17 @@ def init_db():
             practitioner_type TEXT,
             organization_name TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
+            last_login TIMESTAMP,
+            practitioner_type_lc TEXT GENERATED ALWAYS AS (lower(practitioner_type)) VIRTUAL
         )
     ''')
     
+    # Lowercased specialty for the department search; VIRTUAL so existing
+    # databases can gain it with a plain ALTER TABLE
+    _add_missing_columns(cursor, 'users', [
+        ('practitioner_type_lc', 'TEXT GENERATED ALWAYS AS (lower(practitioner_type)) VIRTUAL'),
+    ])
+    
     # Documents table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS documents (
@@ -71,6 +329,10 @@ def init_db():
             admin_reviewed_by INTEGER,
             admin_reviewed_at TIMESTAMP,
             validity_months INTEGER,
+            user_name TEXT,
+            user_email TEXT,
+            user_practitioner_type TEXT,
+            user_organization_name TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id),
@@ -102,8 +364,7 @@ def init_db():
             PRIMARY KEY (verification_id, document_id),
             FOREIGN KEY (verification_id) REFERENCES verifications(id),
             FOREIGN KEY (document_id) REFERENCES documents(id)
-        )
-
+        ) WITHOUT ROWID
     ''')
 
     # Patient Profiles table
@@ -149,7 +410,7 @@ def init_db():
             public_key TEXT NOT NULL,
             private_key TEXT NOT NULL,
             FOREIGN KEY (user_id) REFERENCES users(id)
-        )
+        ) WITHOUT ROWID
     ''')
 
     # Medical Records table
@@ -181,19 +442,153 @@ def init_db():
         )
     ''')
     
-    conn.commit()
+    # AI action audit log
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_action_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            action_type TEXT NOT NULL,
+            action_data BLOB NOT NULL, -- UTF-8 JSON bytes
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
     
-    # Create default admin if not exists
-    cursor.execute("SELECT COUNT(*) as count FROM users WHERE role='admin'")
-    if cursor.fetchone()['count'] == 0:
+    # Applicant details are copied onto each verification so the review
+    # queues don't need to join users; backfill databases created before that
+    added = _add_missing_columns(cursor, 'verifications', [
+        ('user_name', 'TEXT'),
+        ('user_email', 'TEXT'),
+        ('user_practitioner_type', 'TEXT'),
+        ('user_organization_name', 'TEXT'),
+    ])
+    if added:
         cursor.execute('''
-            INSERT INTO users (email, password, name, role)
-            VALUES (?, ?, ?, ?)
-        ''', ('admin@healthcredx.com', 'admin123', 'System Admin', 'admin'))
-        conn.commit()
+            UPDATE verifications
+            SET user_name = u.name, user_email = u.email,
+                user_practitioner_type = u.practitioner_type,
+                user_organization_name = u.organization_name
+            FROM users u
+            WHERE u.id = verifications.user_id
+        ''')
+    
+    # Credentials issued before timestamps became epoch seconds hold local-time
+    # text. SQLite sorts any TEXT above every INTEGER, so those rows would
+    # never expire and would outrank newer credentials; convert them once,
+    # recording the migration in user_version so later starts skip the scan
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()['user_version'] < 1:
+        cursor.execute('''
+            UPDATE credentials
+            SET issued_at = CASE WHEN typeof(issued_at) = 'text'
+                    THEN COALESCE(CAST(strftime('%s', issued_at, 'utc') AS INTEGER), issued_at)
+                    ELSE issued_at END,
+                expires_at = CASE WHEN typeof(expires_at) = 'text'
+                    THEN COALESCE(CAST(strftime('%s', expires_at, 'utc') AS INTEGER), expires_at)
+                    ELSE expires_at END
+            WHERE typeof(issued_at) = 'text' OR typeof(expires_at) = 'text'
+        ''')
+        cursor.execute("PRAGMA user_version = 1")
+    
+    # Keep the copied applicant details in sync with the users table
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_sync_verifications
+        AFTER UPDATE OF name, email, practitioner_type, organization_name ON users
+        BEGIN
+            UPDATE verifications
+            SET user_name = NEW.name, user_email = NEW.email,
+                user_practitioner_type = NEW.practitioner_type,
+                user_organization_name = NEW.organization_name
+            WHERE user_id = NEW.id;
+        END
+    ''')
+    
+    # Bumped by trigger whenever a user is renamed, changes email or is
+    # deleted, so every process can tell when its cached names are stale (see
+    # _user_names). init_db bumps it too: reset_db drops users, and the new
+    # accounts reuse the old ids
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_names_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO user_names_version (id, version) VALUES (1, 0)
+        ON CONFLICT(id) DO UPDATE SET version = version + 1
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_names_version
+        AFTER UPDATE OF name, email ON users
+        BEGIN
+            UPDATE user_names_version SET version = version + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_delete_names_version
+        AFTER DELETE ON users
+        BEGIN
+            UPDATE user_names_version SET version = version + 1;
+        END
+    ''')
+    
+    # Indexes on foreign keys and the status filters used by the dashboards
+    indexes = [
+        # Keyset page order; the rowid id is implicitly the last index key
+        "CREATE INDEX IF NOT EXISTS idx_ver_user_created ON verifications(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ver_created ON verifications(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ver_status ON verifications(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ver_pending ON verifications(status) "
+        "WHERE status IN ('pending_org', 'pending_admin')",
+        # status rides along so the patient stats count from this index alone;
+        # id is spelled out ahead of it to keep the (date_time, id) page order
+        "CREATE INDEX IF NOT EXISTS idx_appt_patient ON appointments(patient_id, date_time, id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_appt_doctor ON appointments(doctor_id, date_time)",
+        "CREATE INDEX IF NOT EXISTS idx_appt_hospital ON appointments(hospital_id, date_time)",
+        # Covering indexes for the dashboard stats: every counted column is in
+        # the index, so the aggregates never read table rows
+        "CREATE INDEX IF NOT EXISTS idx_appt_hosp_status ON appointments(hospital_id, status, patient_id)",
+        "CREATE INDEX IF NOT EXISTS idx_appt_doc_status ON appointments(doctor_id, status, patient_id)",
+        "CREATE INDEX IF NOT EXISTS idx_docs_user ON documents(user_id)",
+        # The primary key covers verification -> documents; this covers the reverse
+        "CREATE INDEX IF NOT EXISTS idx_vd_reverse ON verification_documents(document_id, verification_id)",
+        "CREATE INDEX IF NOT EXISTS idx_cred_user_status ON credentials(user_id, status, issued_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_mr_appt ON medical_records(appointment_id)",
+        # One row per product; also serves the name-ordered medicine list
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_inv_name_unit ON inventory(name, unit_size)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_logs_user ON ai_action_logs(user_id, created_at)",
+        # Department search walks only the practitioner rows and compares the
+        # stored lowercase key instead of calling LOWER() per row
+        "CREATE INDEX IF NOT EXISTS idx_users_ptype_lc ON users(practitioner_type_lc) "
+        "WHERE role = 'practitioner'",
+        # Prescription feeds read only the records that carry a prescription
+        "CREATE INDEX IF NOT EXISTS idx_mr_prescribed ON medical_records(appointment_id) "
+        "WHERE prescription_text IS NOT NULL AND prescription_text != ''",
+        # Partial index over live credentials only, so the expiry sweep scales
+        # with the number of active credentials rather than the whole table
+        "CREATE INDEX IF NOT EXISTS idx_cred_active_exp ON credentials(expires_at) "
+        "WHERE status = 'active'",
+    ]
+    for statement in indexes:
+        cursor.execute(statement)
+    
+    conn.commit()
+    
+    # Create default admin if not exists, in one statement
+    cursor.execute('''
+        INSERT INTO users (email, password, name, role)
+        SELECT ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM users WHERE role = 'admin')
+        ON CONFLICT(email) DO NOTHING
+        RETURNING id
+    ''', ('admin@healthcredx.com', 'admin123', 'System Admin', 'admin'))
+    if cursor.fetchone():
         print("✓ Default admin created (admin@healthcredx.com / admin123)")
+    conn.commit()
     
-    conn.close()
+    release_db(conn)
     
     # Seed demo data
     seed_demo_data()
@@ -202,26 +597,28 @@ def init_db():
 def reset_db():
     """Reset database (drop all tables)"""
     conn = get_db()
-    cursor = conn.cursor()
     
     tables = ['users', 'documents', 'verifications', 'credentials', 'verification_documents', 
-              'patient_profiles', 'appointments', 'user_keys', 'medical_records', 'inventory']
+              'patient_profiles', 'appointments', 'user_keys', 'medical_records', 'inventory',
+              'ai_action_logs']
+    # user_names_version survives the reset: init_db bumps it, which tells
+    # other processes that their cached names are stale
     
-    for table in tables:
-        cursor.execute(f"DROP TABLE IF EXISTS {table}")
-        
-    conn.commit()
-    conn.close()
+    # All drops go in one script and one transaction. Parent tables are dropped
+    # while children still reference them, so foreign keys are off meanwhile.
+    # VACUUM then hands the freed pages back so the next run starts compact
+    drops = ''.join(f"DROP TABLE IF EXISTS {table};\n" for table in tables)
+    conn.executescript(f"PRAGMA foreign_keys=OFF;\nBEGIN;\n{drops}COMMIT;\n"
+                       "PRAGMA foreign_keys=ON;\nVACUUM;")
+    release_db(conn)
+    _invalidate_inventory_cache()
+    _invalidate_practitioners_cache()
+    _user_names.pop(str(DB_PATH), None)
     print("✓ Database reset")
     init_db()
 
 def seed_demo_data():
     """Seed the database with demo accounts"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    import auth
-    import crypto_utils
     hashed_pw = auth.hash_password('password')
     
     # 1. Hospitals
@@ -231,15 +628,6 @@ def seed_demo_data():
         ('apollo@test.com', 'Apollo Hospitals')
     ]
     
-    for email, name in hospitals:
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO users (email, password, name, role, organization_name)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (email, hashed_pw, name, 'hospital', name))
-            print(f"Seeded {name}")
-
     # 2. Doctors
     doctors = [
         ('doctor@test.com', 'Dr. Sarah Smith', 'General Physician'),
@@ -248,19 +636,6 @@ def seed_demo_data():
         ('peds@test.com', 'Dr. Michael Brown', 'Pediatrician')
     ]
     
-    for email, name, type_ in doctors:
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if not cursor.fetchone():
-            private_key, public_key = crypto_utils.generate_key_pair()
-            cursor.execute('''
-                INSERT INTO users (email, password, name, role, practitioner_type)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (email, hashed_pw, name, 'practitioner', type_))
-            user_id = cursor.lastrowid
-            cursor.execute('INSERT OR REPLACE INTO user_keys (user_id, private_key, public_key) VALUES (?, ?, ?)',
-                           (user_id, private_key, public_key))
-            print(f"Seeded {name}")
-
     # 3. Patients
     patients = [
         ('patient@test.com', 'John Doe'),
@@ -268,32 +643,61 @@ def seed_demo_data():
         ('bob@test.com', 'Bob Johnson')
     ]
     
-    for email, name in patients:
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO users (email, password, name, role)
-                VALUES (?, ?, ?, ?)
-            ''', (email, hashed_pw, name, 'patient'))
-            print(f"Seeded {name}")
-
     # 4. Pharma
     pharmas = [
         ('pharma@test.com', 'MediCare Pharmacy'),
         ('wellness@test.com', 'Wellness Chemist')
     ]
     
-    for email, name in pharmas:
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO users (email, password, name, role, organization_name)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (email, hashed_pw, name, 'pharma', name))
-            print(f"Seeded {name}")
+    # (email, password, name, role, organization_name, practitioner_type)
+    rows = ([(email, hashed_pw, name, 'hospital', name, None) for email, name in hospitals] +
+            [(email, hashed_pw, name, 'practitioner', None, type_) for email, name, type_ in doctors] +
+            [(email, hashed_pw, name, 'patient', None, None) for email, name in patients] +
+            [(email, hashed_pw, name, 'pharma', name, None) for email, name in pharmas])
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # One upsert for every demo account; RETURNING reports only the rows that
+    # were actually inserted, so no existence probe is needed
+    placeholders = ', '.join(['(?, ?, ?, ?, ?, ?)'] * len(rows))
+    with conn:
+        cursor.execute(f'''
+            INSERT INTO users (email, password, name, role, organization_name, practitioner_type)
+            VALUES {placeholders}
+            ON CONFLICT(email) DO NOTHING
+            RETURNING id, name, role
+        ''', [value for row in rows for value in row])
+        inserted = cursor.fetchall()
+    
+    # Key pairs for demo doctors that don't have one yet. Looking them up,
+    # rather than using only this run's inserts, also repairs doctors left
+    # keyless by an earlier run that died between the two commits
+    doctor_emails = [email for email, _, _ in doctors]
+    cursor.execute(f'''
+        SELECT id FROM users
+        WHERE email IN ({', '.join(['?'] * len(doctor_emails))})
+          AND NOT EXISTS (SELECT 1 FROM user_keys WHERE user_keys.user_id = users.id)
+    ''', doctor_emails)
+    doctor_ids = [row['id'] for row in cursor.fetchall()]
+    
+    # RSA keygen runs outside any transaction so it doesn't hold the database
+    # lock. OpenSSL keygen runs without the GIL, so threads spread it across cores
+    if doctor_ids:
+        with ThreadPoolExecutor(max_workers=len(doctor_ids)) as pool:
+            pairs = list(pool.map(lambda _: crypto_utils.generate_key_pair(), doctor_ids))
         
-    conn.commit()
-    conn.close()
+        with conn:
+            cursor.executemany('''
+                INSERT INTO user_keys (user_id, private_key, public_key) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO NOTHING
+            ''', [(user_id, *pair) for user_id, pair in zip(doctor_ids, pairs)])
+    
+    for row in inserted:
+        print(f"Seeded {row['name']}")
+    release_db(conn)
+    if any(row['role'] == 'practitioner' for row in inserted):
+        _invalidate_practitioners_cache()
 
 def seed_comprehensive_data():
     """Seed database with rich test data"""
@@ -303,7 +707,7 @@ def seed_comprehensive_data():
     # Only seed if no appointments exist
     cursor.execute("SELECT COUNT(*) as count FROM appointments")
     if cursor.fetchone()['count'] > 0:
-        conn.close()
+        release_db(conn)
         # Still ensure inventory is seeded
         seed_inventory()
         return
@@ -311,41 +715,43 @@ def seed_comprehensive_data():
     print("Seeding comprehensive data...")
     
     # Get IDs
-    cursor.execute("SELECT id FROM users WHERE email='patient@test.com'")
-    patient_id = cursor.fetchone()['id']
-    cursor.execute("SELECT id FROM users WHERE email='doctor@test.com'")
-    doctor_id = cursor.fetchone()['id']
-    cursor.execute("SELECT id FROM users WHERE email='hospital@test.com'")
-    hospital_id = cursor.fetchone()['id']
-
-    # Create Patient Profile
-    cursor.execute("INSERT OR IGNORE INTO patient_profiles (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                   (patient_id, "1234-5678-9012", "1985-06-15", "Male", "O+", 75.5, 178.0, "Asthma, Seasonal Allergies"))
-
-    # Create Past Appointments
-    # ... (Keep existing appointment logic but maybe add more if needed, for now keeping it simple to avoid huge file)
+    cursor.execute("SELECT id, email FROM users WHERE email IN (?, ?, ?)",
+                   ('patient@test.com', 'doctor@test.com', 'hospital@test.com'))
+    ids = {row['email']: row['id'] for row in cursor.fetchall()}
+    patient_id = ids['patient@test.com']
+    doctor_id = ids['doctor@test.com']
+    hospital_id = ids['hospital@test.com']
+
+    # Past visits: (days ago, department, symptoms, diagnosis, prescription, signature, hash)
+    visits = [
+        (180, 'General Medicine', 'Routine checkup', "Vitamin D Deficiency", "Vitamin D3 60k IU", "sig_1", "hash_1"),
+    ]
     
-    # Record 1
-    date_1 = (datetime.now() - timedelta(days=180)).isoformat()
-    cursor.execute("INSERT INTO appointments (patient_id, doctor_id, hospital_id, date_time, status, department, symptoms) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                   (patient_id, doctor_id, hospital_id, date_1, 'completed', 'General Medicine', 'Routine checkup'))
-    appt_id_1 = cursor.lastrowid
-    cursor.execute("INSERT INTO medical_records (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash) VALUES (?, ?, ?, ?, ?)",
-                   (appt_id_1, "Vitamin D Deficiency", "Vitamin D3 60k IU", "sig_1", "hash_1"))
+    with conn:
+        # Create Patient Profile
+        cursor.execute("INSERT INTO patient_profiles (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(user_id) DO NOTHING",
+                       (patient_id, "1234-5678-9012", "1985-06-15", "Male", "O+", 75.5, 178.0, "Asthma, Seasonal Allergies"))
+
+        # Create Past Appointments in a single multi-row INSERT
+        appointments = [(patient_id, doctor_id, hospital_id,
+                         (datetime.now() - timedelta(days=days_ago)).isoformat(),
+                         'completed', department, symptoms)
+                        for days_ago, department, symptoms, *_ in visits]
+        placeholders = ', '.join(['(?, ?, ?, ?, ?, ?, ?)'] * len(appointments))
+        cursor.execute(f"INSERT INTO appointments (patient_id, doctor_id, hospital_id, date_time, status, department, symptoms) VALUES {placeholders} RETURNING id",
+                       [value for appt in appointments for value in appt])
+        # RETURNING order is unspecified, but ids are allocated in VALUES order
+        appt_ids = sorted(row['id'] for row in cursor.fetchall())
+        
+        cursor.executemany("INSERT INTO medical_records (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash) VALUES (?, ?, ?, ?, ?)",
+                           [(appt_id, *visit[3:]) for appt_id, visit in zip(appt_ids, visits)])
 
-    conn.commit()
-    conn.close()
+    release_db(conn)
     seed_inventory()
     print("✓ Comprehensive data seeded")
 
 def seed_inventory():
     """Seed pharmacy inventory with diverse items"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Clear existing to ensure fresh data
-    cursor.execute("DELETE FROM inventory")
-    
     medicines = [
         # Tablets/Capsules
         ('Amoxicillin', 'tablet', '500mg', 100, 15.50),
@@ -372,883 +778,1025 @@ def seed_inventory():
         ('Diclofenac Gel', 'topical', '30g', 40, 95.00)
     ]
     
-    cursor.executemany("INSERT INTO inventory (name, type, unit_size, stock, price) VALUES (?, ?, ?, ?, ?)", medicines)
-    conn.commit()
-    conn.close()
-    print("✓ Inventory seeded with diverse items")
+    # Items already on the shelf are left alone, so restarts keep current
+    # stock and write nothing once the catalogue is in place
+    conn = get_db()
+    cursor = conn.cursor()
+    with conn:
+        cursor.executemany('''
+            INSERT INTO inventory (name, type, unit_size, stock, price) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name, unit_size) DO NOTHING
+        ''', medicines)
+        added = cursor.rowcount
+    release_db(conn)
+    if added > 0:
+        _invalidate_inventory_cache()
+        print("✓ Inventory seeded with diverse items")
+
+# Inventory is read-mostly, so the medicine list is cached until a write bumps
+# the version. A reader only stores its result if no write landed meanwhile
+_inv_version = 0
+_inv_cache = {}  # DB path -> (version, medicines)
+
+def _invalidate_inventory_cache():
+    """Drop cached inventory; call after any write to the inventory table"""
+    global _inv_version
+    _inv_version += 1
+    _inv_cache.clear()
+
+_SQL_ALL_MEDICINES = 'SELECT * FROM inventory ORDER BY name'
 
 def get_all_medicines():
-    """Get all medicines from inventory"""
-    conn = get_db()
+    """Get all medicines from inventory
+
+    The item dicts are shared with the cache and must not be modified.
+    """
+    version = _inv_version
+    cached = _inv_cache.get(str(DB_PATH))
+    if cached and cached[0] == version:
+        return list(cached[1])
+    
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM inventory ORDER BY name")
+    cursor.execute(_SQL_ALL_MEDICINES)
     items = cursor.fetchall()
-    conn.close()
-    return [dict(item) for item in items]
+    if version == _inv_version:
+        _inv_cache[str(DB_PATH)] = (version, items)
+    return list(items)
 
 # User operations
-def create_user(email, password, name, role, practitioner_type=None, organization_name=None):
+_SQL_CREATE_USER = '''
+    INSERT INTO users (email, password, name, role, practitioner_type, organization_name)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+def create_user(email, password, name, role, practitioner_type=None, organization_name=None, conn=None):
     """Create a new user"""
-    conn = get_db()
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO users (email, password, name, role, practitioner_type, organization_name)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (email, password, name, role, practitioner_type, organization_name))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return user_id
+        cursor = _execute_write(conn, _SQL_CREATE_USER,
+                                (email, password, name, role, practitioner_type, organization_name))
     except sqlite3.IntegrityError:
-        conn.close()
         return None
+    if role == 'practitioner':
+        _invalidate_practitioners_cache()
+    return cursor.lastrowid
+
+_SQL_GET_USER_BY_EMAIL = 'SELECT * FROM users WHERE email = ?'
 
 def get_user_by_email(email):
     """Get user by email"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+    cursor.execute(_SQL_GET_USER_BY_EMAIL, (email,))
     user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+    return user
+
+_SQL_GET_USER_BY_ID = 'SELECT * FROM users WHERE id = ?'
 
 def get_user_by_id(user_id):
     """Get user by ID"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+    cursor.execute(_SQL_GET_USER_BY_ID, (user_id,))
     user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+    return user
+
+_SQL_UPDATE_LAST_LOGIN = 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?'
 
 def update_last_login(user_id):
     """Update user's last login time"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('UPDATE users SET last_login = ? WHERE id = ?', 
-                   (datetime.now(), user_id))
+    cursor.execute(_SQL_UPDATE_LAST_LOGIN, (user_id,))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+_SQL_ALL_USERS_SAFE = '''
+    SELECT id, email, name, role, practitioner_type, organization_name, 
+           created_at, last_login 
+    FROM users 
+    ORDER BY created_at DESC
+'''
+
+def iter_all_users_safe():
+    """Iterate over all users with safe fields (no passwords)"""
+    return _iter_rows(_SQL_ALL_USERS_SAFE)
 
 def get_all_users_safe():
     """Get all users with safe fields (no passwords)"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, email, name, role, practitioner_type, organization_name, 
-               created_at, last_login 
-        FROM users 
-        ORDER BY created_at DESC
-    ''')
+    cursor.execute(_SQL_ALL_USERS_SAFE)
     users = cursor.fetchall()
-    conn.close()
-    return [dict(user) for user in users]
+    release_db(conn)
+    return users
+
+_SQL_DASHBOARD_STATS = '''
+    WITH r AS (SELECT role, COUNT(*) AS c FROM users GROUP BY role)
+    SELECT role || '_count' AS stat, c AS count FROM r
+    UNION ALL
+    SELECT 'diagnosis_count', COUNT(*) FROM medical_records
+    UNION ALL
+    SELECT 'pending_verifications', COUNT(*) FROM verifications
+    WHERE status IN ('pending_org', 'pending_admin')
+'''
+
+# Dashboards refresh more often than the counts change
+DASHBOARD_STATS_TTL = 5  # seconds
+_dashboard_stats_cache = {}  # DB path -> (expires, stats)
 
 def get_dashboard_stats():
     """Get stats for admin dashboard"""
-    conn = get_db()
-    cursor = conn.cursor()
+    cached = _dashboard_stats_cache.get(str(DB_PATH))
+    if cached and cached[0] > time.monotonic():
+        return dict(cached[1])
     
-    stats = {}
+    conn = get_db_ro()
+    cursor = conn.cursor()
     
-    # Count users by role
-    cursor.execute("SELECT role, COUNT(*) as count FROM users GROUP BY role")
+    # Role counts, total diagnoses (medical records) and pending verifications
+    # in one round-trip; roles with no users fall back to 0
+    stats = {'patient_count': 0, 'hospital_count': 0, 'practitioner_count': 0}
+    cursor.execute(_SQL_DASHBOARD_STATS)
     for row in cursor.fetchall():
-        stats[f"{row['role']}_count"] = row['count']
-        
-    # Total patients (fallback if 0 from above)
-    if 'patient_count' not in stats: stats['patient_count'] = 0
-    if 'hospital_count' not in stats: stats['hospital_count'] = 0
-    if 'practitioner_count' not in stats: stats['practitioner_count'] = 0
-    
-    # Total diagnosis (medical records)
-    cursor.execute("SELECT COUNT(*) as count FROM medical_records")
-    stats['diagnosis_count'] = cursor.fetchone()['count']
-    
-    # Pending verifications
-    cursor.execute("SELECT COUNT(*) as count FROM verifications WHERE status IN ('pending_org', 'pending_admin')")
-    stats['pending_verifications'] = cursor.fetchone()['count']
+        stats[row['stat']] = row['count']
     
-    conn.close()
-    return stats
+    _dashboard_stats_cache[str(DB_PATH)] = (time.monotonic() + DASHBOARD_STATS_TTL, stats)
+    return dict(stats)
 
 # Document operations
+_SQL_CREATE_DOCUMENT = '''
+    INSERT INTO documents (user_id, filename, filepath, document_type, file_size)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
 def create_document(user_id, filename, filepath, document_type, file_size):
     """Create document record"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO documents (user_id, filename, filepath, document_type, file_size)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (user_id, filename, filepath, document_type, file_size))
+    cursor.execute(_SQL_CREATE_DOCUMENT, (user_id, filename, filepath, document_type, file_size))
     conn.commit()
     doc_id = cursor.lastrowid
-    conn.close()
+    release_db(conn)
     return doc_id
 
+_SQL_DOCUMENTS_BY_USER = 'SELECT * FROM documents WHERE user_id = ? ORDER BY upload_date DESC'
+
 def get_documents_by_user(user_id):
     """Get all documents for a user"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM documents WHERE user_id = ? ORDER BY upload_date DESC', 
-                   (user_id,))
+    cursor.execute(_SQL_DOCUMENTS_BY_USER, (user_id,))
     docs = cursor.fetchall()
-    conn.close()
-    return [dict(doc) for doc in docs]
+    release_db(conn)
+    return docs
+
+_SQL_GET_DOCUMENT_BY_ID = 'SELECT * FROM documents WHERE id = ?'
 
 def get_document_by_id(doc_id):
     """Get document by ID"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM documents WHERE id = ?', (doc_id,))
+    cursor.execute(_SQL_GET_DOCUMENT_BY_ID, (doc_id,))
     doc = cursor.fetchone()
-    conn.close()
-    return dict(doc) if doc else None
+    return doc
 
 # Verification operations
-def create_verification(user_id):
+_SQL_CREATE_VERIFICATION = '''
+    INSERT INTO verifications (user_id, status, user_name, user_email,
+                               user_practitioner_type, user_organization_name)
+    SELECT id, 'submitted', name, email, practitioner_type, organization_name
+    FROM users WHERE id = ?
+'''
+
+def create_verification(user_id, conn=None):
     """Create new verification request"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO verifications (user_id, status)
-        VALUES (?, 'submitted')
-    ''', (user_id,))
-    conn.commit()
-    ver_id = cursor.lastrowid
-    conn.close()
-    return ver_id
+    cursor = _execute_write(conn, _SQL_CREATE_VERIFICATION, (user_id,))
+    return cursor.lastrowid if cursor.rowcount else None
+
+_SQL_LINK_DOCUMENT = '''
+    INSERT INTO verification_documents (verification_id, document_id)
+    VALUES (?, ?)
+'''
 
 def link_document_to_verification(verification_id, document_id):
     """Link a document to a verification"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO verification_documents (verification_id, document_id)
-        VALUES (?, ?)
-    ''', (verification_id, document_id))
+    cursor.execute(_SQL_LINK_DOCUMENT, (verification_id, document_id))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+_SQL_UPDATE_VER_STATUS = '''
+    UPDATE verifications 
+    SET status = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
 
-def update_verification_status(ver_id, status):
+def update_verification_status(ver_id, status, conn=None):
     """Update verification status"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE verifications 
-        SET status = ?, updated_at = ?
-        WHERE id = ?
-    ''', (status, datetime.now(), ver_id))
-    conn.commit()
-    conn.close()
+    _execute_write(conn, _SQL_UPDATE_VER_STATUS, (status, ver_id))
+
+_SQL_UPDATE_VER_AI_ANALYSIS = '''
+    UPDATE verifications 
+    SET ai_score = ?, ai_analysis = ?, status = 'pending_org', updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
 
-def update_verification_ai_analysis(ver_id, score, analysis):
+def update_verification_ai_analysis(ver_id, score, analysis, conn=None):
     """Update verification with AI analysis results"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE verifications 
-        SET ai_score = ?, ai_analysis = ?, status = 'pending_org', updated_at = ?
-        WHERE id = ?
-    ''', (score, json.dumps(analysis), datetime.now(), ver_id))
-    conn.commit()
-    conn.close()
+    _execute_write(conn, _SQL_UPDATE_VER_AI_ANALYSIS, (score, _json_dumps(analysis), ver_id))
 
-def update_verification_org_review(ver_id, verdict, comments, reviewer_id):
+_SQL_UPDATE_VER_ORG_REVIEW = '''
+    UPDATE verifications 
+    SET org_verdict = ?, org_comments = ?, org_reviewed_by = ?, 
+        org_reviewed_at = CURRENT_TIMESTAMP, status = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+
+def update_verification_org_review(ver_id, verdict, comments, reviewer_id, conn=None):
     """Update verification with organization review"""
-    conn = get_db()
-    cursor = conn.cursor()
     new_status = 'org_approved' if verdict == 'approved' else 'org_rejected'
-    cursor.execute('''
-        UPDATE verifications 
-        SET org_verdict = ?, org_comments = ?, org_reviewed_by = ?, 
-            org_reviewed_at = ?, status = ?, updated_at = ?
-        WHERE id = ?
-    ''', (verdict, comments, reviewer_id, datetime.now(), new_status, datetime.now(), ver_id))
-    conn.commit()
-    conn.close()
+    _execute_write(conn, _SQL_UPDATE_VER_ORG_REVIEW, (verdict, comments, reviewer_id, new_status, ver_id))
 
-def update_verification_admin_decision(ver_id, verdict, comments, admin_id, validity_months=None):
+_SQL_UPDATE_VER_ADMIN_DECISION = '''
+    UPDATE verifications 
+    SET admin_verdict = ?, admin_comments = ?, admin_reviewed_by = ?,
+        admin_reviewed_at = CURRENT_TIMESTAMP, validity_months = ?, status = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+
+def update_verification_admin_decision(ver_id, verdict, comments, admin_id, validity_months=None, conn=None):
     """Update verification with admin decision"""
-    conn = get_db()
-    cursor = conn.cursor()
     new_status = 'approved' if verdict == 'approved' else 'dismissed'
-    cursor.execute('''
-        UPDATE verifications 
-        SET admin_verdict = ?, admin_comments = ?, admin_reviewed_by = ?,
-            admin_reviewed_at = ?, validity_months = ?, status = ?, updated_at = ?
-        WHERE id = ?
-    ''', (verdict, comments, admin_id, datetime.now(), validity_months, new_status, datetime.now(), ver_id))
-    conn.commit()
-    conn.close()
+    _execute_write(conn, _SQL_UPDATE_VER_ADMIN_DECISION,
+                   (verdict, comments, admin_id, validity_months, new_status, ver_id))
+
+_SQL_GET_VERIFICATION_BY_ID = 'SELECT * FROM verifications WHERE id = ?'
 
 def get_verification_by_id(ver_id):
     """Get verification by ID"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM verifications WHERE id = ?', (ver_id,))
+    cursor.execute(_SQL_GET_VERIFICATION_BY_ID, (ver_id,))
     ver = cursor.fetchone()
-    conn.close()
-    return dict(ver) if ver else None
+    return ver
+
+_SQL_VERIFICATIONS_BY_USER = '''
+    SELECT * FROM verifications 
+    WHERE user_id = ? AND (? IS NULL OR (created_at, id) < (?, ?))
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
 
-def get_verifications_by_user(user_id):
-    """Get all verifications for a user"""
+def get_verifications_by_user(user_id, before_ts=None, before_id=None, limit=-1):
+    """Get verifications for a user, newest first (all of them unless limit is given)"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM verifications 
-        WHERE user_id = ? 
-        ORDER BY created_at DESC
-    ''', (user_id,))
+    cursor.execute(_SQL_VERIFICATIONS_BY_USER,
+                   (user_id, before_ts, before_ts, before_id, limit))
     vers = cursor.fetchall()
-    conn.close()
-    return [dict(ver) for ver in vers]
+    release_db(conn)
+    return vers
+
+# Verification rows carry the applicant's details, so no users join is needed;
+# the aliases keep the keys the templates already use
+_VERIFICATION_COLUMNS = '''
+    *, user_practitioner_type AS practitioner_type,
+    user_organization_name AS organization_name
+'''
+
+_SQL_PENDING_ORG_VERIFICATIONS = f'''
+    SELECT {_VERIFICATION_COLUMNS}
+    FROM verifications
+    WHERE status = 'pending_org'
+    ORDER BY created_at ASC
+'''
 
 def get_pending_org_verifications():
     """Get all verifications pending organization review"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT v.*, u.name as user_name, u.email as user_email, 
-               u.practitioner_type
-        FROM verifications v
-        JOIN users u ON v.user_id = u.id
-        WHERE v.status = 'pending_org'
-        ORDER BY v.created_at ASC
-    ''')
+    cursor.execute(_SQL_PENDING_ORG_VERIFICATIONS)
     vers = cursor.fetchall()
-    conn.close()
-    return [dict(ver) for ver in vers]
+    release_db(conn)
+    return vers
+
+_SQL_PENDING_ADMIN_VERIFICATIONS = f'''
+    SELECT {_VERIFICATION_COLUMNS}
+    FROM verifications
+    WHERE status = 'pending_admin'
+    ORDER BY created_at ASC
+'''
 
 def get_pending_admin_verifications():
     """Get all verifications pending admin approval"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT v.*, u.name as user_name, u.email as user_email,
-               u.practitioner_type
-        FROM verifications v
-        JOIN users u ON v.user_id = u.id
-        WHERE v.status = 'pending_admin'
-        ORDER BY v.created_at ASC
-    ''')
+    cursor.execute(_SQL_PENDING_ADMIN_VERIFICATIONS)
     vers = cursor.fetchall()
-    conn.close()
-    return [dict(ver) for ver in vers]
-
-def get_all_verifications():
-    """Get all verifications (for admin)"""
+    release_db(conn)
+    return vers
+
+# Keyset pagination: callers pass the created_at/id of the last row they saw,
+# so each page is an index seek instead of an OFFSET scan over older rows.
+# (created_at, id) < (?, NULL) degrades to created_at < ? when no id is given
+_SQL_ALL_VERIFICATIONS = f'''
+    SELECT {_VERIFICATION_COLUMNS}
+    FROM verifications
+    WHERE (? IS NULL OR (created_at, id) < (?, ?))
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+def get_all_verifications(before_ts=None, before_id=None, limit=-1):
+    """Get verifications (for admin), newest first (all of them unless limit is given)"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT v.*, u.name as user_name, u.email as user_email,
-               u.practitioner_type
-        FROM verifications v
-        JOIN users u ON v.user_id = u.id
-        ORDER BY v.created_at DESC
-    ''')
+    cursor.execute(_SQL_ALL_VERIFICATIONS, (before_ts, before_ts, before_id, limit))
     vers = cursor.fetchall()
-    conn.close()
-    return [dict(ver) for ver in vers]
+    release_db(conn)
+    return vers
+
+def iter_all_verifications(before_ts=None, before_id=None, limit=-1):
+    """Iterate over verifications (for admin), newest first"""
+    return _iter_rows(_SQL_ALL_VERIFICATIONS, (before_ts, before_ts, before_id, limit))
+
+_APPLICATION_STATUS_FILTERS = {
+    'approved': "status = 'approved'",
+    'rejected': "status IN ('dismissed', 'org_rejected')",
+    'pending': "status IN ('submitted', 'ai_analysis', 'pending_org', 'pending_admin')",
+}
+
+# One query string per status filter, built once so every call reuses the
+# same prepared statement
+_SQL_PRACTITIONER_APPLICATIONS = {
+    status: f'''
+        SELECT {_VERIFICATION_COLUMNS}
+        FROM verifications
+        WHERE {status_filter} AND (? IS NULL OR (created_at, id) < (?, ?))
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    '''
+    for status, status_filter in {**_APPLICATION_STATUS_FILTERS, None: '1'}.items()
+}
 
-def get_practitioner_applications(status=None):
-    """Get practitioner applications by status"""
+def get_practitioner_applications(status=None, before_ts=None, before_id=None, limit=-1):
+    """Get practitioner applications by status, newest first (all unless limit is given)"""
     conn = get_db()
     cursor = conn.cursor()
     
-    query = '''
-        SELECT v.*, u.name as user_name, u.email as user_email,
-               u.practitioner_type, u.organization_name
-        FROM verifications v
-        JOIN users u ON v.user_id = u.id
-        WHERE u.role = 'practitioner'
-    '''
-    
-    if status:
-        if status == 'approved':
-            query += " AND v.status = 'approved'"
-        elif status == 'rejected':
-            query += " AND v.status IN ('dismissed', 'org_rejected')"
-        elif status == 'pending':
-            query += " AND v.status IN ('submitted', 'ai_analysis', 'pending_org', 'pending_admin')"
-            
-    query += " ORDER BY v.created_at DESC"
-    
-    cursor.execute(query)
+    # Only practitioners can submit verifications, so every row is an application
+    query = _SQL_PRACTITIONER_APPLICATIONS.get(status, _SQL_PRACTITIONER_APPLICATIONS[None])
+    cursor.execute(query, (before_ts, before_ts, before_id, limit))
     vers = cursor.fetchall()
-    conn.close()
-    return [dict(ver) for ver in vers]
+    release_db(conn)
+    return vers
+
 
+_SQL_VERIFICATION_DOCUMENTS = '''
+    SELECT d.*
+    FROM documents d
+    JOIN verification_documents vd ON d.id = vd.document_id
+    WHERE vd.verification_id = ?
+'''
 
 def get_verification_documents(ver_id):
     """Get all documents for a verification"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT d.*
-        FROM documents d
-        JOIN verification_documents vd ON d.id = vd.document_id
-        WHERE vd.verification_id = ?
-    ''', (ver_id,))
+    cursor.execute(_SQL_VERIFICATION_DOCUMENTS, (ver_id,))
     docs = cursor.fetchall()
-    conn.close()
-    return [dict(doc) for doc in docs]
+    release_db(conn)
+    return docs
 
 # Credential operations
-def create_credential(verification_id, user_id, blockchain_hash, validity_months):
+_SQL_CREATE_CREDENTIAL = '''
+    INSERT INTO credentials (verification_id, user_id, blockchain_hash, 
+                            issued_at, expires_at, status)
+    VALUES (?, ?, ?, ?, ?, 'active')
+'''
+
+def create_credential(verification_id, user_id, blockchain_hash, validity_months, conn=None):
     """Create credential after approval"""
-    conn = get_db()
-    cursor = conn.cursor()
-    issued_at = datetime.now()
-    expires_at = issued_at + timedelta(days=30 * validity_months)
+    issued_at = int(time.time())
+    expires_at = issued_at + int(timedelta(days=30 * validity_months).total_seconds())
     
-    cursor.execute('''
-        INSERT INTO credentials (verification_id, user_id, blockchain_hash, 
-                                issued_at, expires_at, status)
-        VALUES (?, ?, ?, ?, ?, 'active')
-    ''', (verification_id, user_id, blockchain_hash, issued_at, expires_at))
-    conn.commit()
-    cred_id = cursor.lastrowid
-    conn.close()
-    return cred_id
+    cursor = _execute_write(conn, _SQL_CREATE_CREDENTIAL,
+                            (verification_id, user_id, blockchain_hash, issued_at, expires_at))
+    return cursor.lastrowid
+
+_SQL_ACTIVE_CREDENTIAL = '''
+    SELECT * FROM credentials 
+    WHERE user_id = ? AND status = 'active'
+    ORDER BY issued_at DESC
+    LIMIT 1
+'''
 
 def get_active_credential(user_id):
     """Get active credential for a user"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM credentials 
-        WHERE user_id = ? AND status = 'active'
-        ORDER BY issued_at DESC
-        LIMIT 1
-    ''', (user_id,))
+    cursor.execute(_SQL_ACTIVE_CREDENTIAL, (user_id,))
     cred = cursor.fetchone()
-    conn.close()
-    return dict(cred) if cred else None
+    if not cred:
+        return None
+    cred['issued_at'] = _format_epoch(cred['issued_at'])
+    cred['expires_at'] = _format_epoch(cred['expires_at'])
+    return cred
+
+# Rows expired per write transaction, so a large backlog doesn't hold the
+# write lock for the whole sweep
+EXPIRE_BATCH_SIZE = 1000
+
+_SQL_EXPIRE_CREDENTIALS = '''
+    UPDATE credentials 
+    SET status = 'expired'
+    WHERE id IN (
+        SELECT id FROM credentials
+        WHERE status = 'active'
+          AND (expires_at < CAST(strftime('%s', 'now') AS INTEGER)
+               -- Legacy local-time text rows that init_db hasn't converted
+               -- yet; >= '' confines this range to TEXT values
+               OR (expires_at >= '' AND expires_at < datetime('now', 'localtime')))
+        LIMIT ?
+    )
+    RETURNING user_id
+'''
 
 def check_expired_credentials():
-    """Mark expired credentials"""
+    """Mark expired credentials and return the affected user IDs"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE credentials 
-        SET status = 'expired'
-        WHERE status = 'active' AND expires_at < ?
-    ''', (datetime.now(),))
-    conn.commit()
-    expired_count = cursor.rowcount
-    conn.close()
-    return expired_count
+    expired_user_ids = []
+    while True:
+        cursor.execute(_SQL_EXPIRE_CREDENTIALS, (EXPIRE_BATCH_SIZE,))
+        batch = [row['user_id'] for row in cursor.fetchall()]
+        conn.commit()
+        expired_user_ids.extend(batch)
+        if len(batch) < EXPIRE_BATCH_SIZE:
+            break
+    release_db(conn)
+    return expired_user_ids
 
 # Patient operations
+_SQL_CREATE_PATIENT_PROFILE = '''
+    INSERT INTO patient_profiles (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
 def create_patient_profile(user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions):
     """Create patient profile"""
     conn = get_db()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO patient_profiles (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions))
+        cursor.execute(_SQL_CREATE_PATIENT_PROFILE, (user_id, aadhar_number, dob, gender, blood_type, weight, height, existing_conditions))
         conn.commit()
         profile_id = cursor.lastrowid
-        conn.close()
+        release_db(conn)
         return profile_id
     except sqlite3.IntegrityError:
-        conn.close()
+        release_db(conn)
         return None
 
+_SQL_GET_PATIENT_PROFILE = 'SELECT * FROM patient_profiles WHERE user_id = ?'
+
 def get_patient_profile(user_id):
     """Get patient profile by user_id"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM patient_profiles WHERE user_id = ?', (user_id,))
+    cursor.execute(_SQL_GET_PATIENT_PROFILE, (user_id,))
     profile = cursor.fetchone()
-    conn.close()
-    return dict(profile) if profile else None
+    return profile
 
 # Appointment operations
+_SQL_CREATE_APPOINTMENT = '''
+    INSERT INTO appointments (patient_id, doctor_id, hospital_id, date_time, department)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
 def create_appointment(patient_id, doctor_id, hospital_id, date_time, department):
     """Create new appointment"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO appointments (patient_id, doctor_id, hospital_id, date_time, department)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (patient_id, doctor_id, hospital_id, date_time, department))
+    cursor.execute(_SQL_CREATE_APPOINTMENT, (patient_id, doctor_id, hospital_id, date_time, department))
     conn.commit()
     appt_id = cursor.lastrowid
-    conn.close()
+    release_db(conn)
     return appt_id
 
-def get_appointments_by_user(user_id, role):
-    """Get appointments for a user based on role"""
-    conn = get_db()
+_SQL_PATIENT_APPOINTMENTS = '''
+    SELECT a.*, 
+           doc.name as doctor_name, 
+           hosp.name as hospital_name,
+           hosp.organization_name as hospital_org_name
+    FROM appointments a
+    LEFT JOIN users doc ON a.doctor_id = doc.id
+    JOIN users hosp ON a.hospital_id = hosp.id
+    WHERE a.patient_id = ? AND (? IS NULL OR (a.date_time, a.id) < (?, ?))
+    ORDER BY a.date_time DESC, a.id DESC
+    LIMIT ?
+'''
+
+_SQL_DOCTOR_APPOINTMENTS = '''
+    SELECT a.*, 
+           pat.name as patient_name,
+           prof.aadhar_number,
+           prof.gender,
+           prof.dob
+    FROM appointments a
+    JOIN users pat ON a.patient_id = pat.id
+    LEFT JOIN patient_profiles prof ON pat.id = prof.user_id
+    WHERE a.doctor_id = ? AND (? IS NULL OR (a.date_time, a.id) > (?, ?))
+    ORDER BY a.date_time ASC, a.id ASC
+    LIMIT ?
+'''
+
+_SQL_HOSPITAL_APPOINTMENTS = '''
+    SELECT a.*, 
+           pat.name as patient_name,
+           doc.name as doctor_name
+    FROM appointments a
+    JOIN users pat ON a.patient_id = pat.id
+    LEFT JOIN users doc ON a.doctor_id = doc.id
+    WHERE a.hospital_id = ? AND (? IS NULL OR (a.date_time, a.id) > (?, ?))
+    ORDER BY a.date_time ASC, a.id ASC
+    LIMIT ?
+'''
+
+# Appointment lists page by keyset too: cursor_ts/cursor_id are the date_time
+# and id of the last row already shown, and the next page continues past it in
+# the list's own order. The default limit of -1 (no limit in SQLite) keeps the
+# dashboards showing every appointment
+def _fetch_appointments(query, user_id, cursor_ts, cursor_id, limit):
+    conn = get_db_ro()
     cursor = conn.cursor()
-    
-    if role == 'patient':
-        query = '''
-            SELECT a.*, 
-                   doc.name as doctor_name, 
-                   hosp.name as hospital_name,
-                   hosp.organization_name as hospital_org_name
-            FROM appointments a
-            LEFT JOIN users doc ON a.doctor_id = doc.id
-            JOIN users hosp ON a.hospital_id = hosp.id
-            WHERE a.patient_id = ?
-            ORDER BY a.date_time DESC
-        '''
-    elif role == 'practitioner':
-        query = '''
-            SELECT a.*, 
-                   pat.name as patient_name,
-                   prof.aadhar_number,
-                   prof.gender,
-                   prof.dob
-            FROM appointments a
-            JOIN users pat ON a.patient_id = pat.id
-            LEFT JOIN patient_profiles prof ON pat.id = prof.user_id
-            WHERE a.doctor_id = ?
-            ORDER BY a.date_time ASC
-        '''
-    elif role == 'hospital':
-        query = '''
-            SELECT a.*, 
-                   pat.name as patient_name,
-                   doc.name as doctor_name
-            FROM appointments a
-            JOIN users pat ON a.patient_id = pat.id
-            LEFT JOIN users doc ON a.doctor_id = doc.id
-            WHERE a.hospital_id = ?
-            ORDER BY a.date_time ASC
-        '''
-    else:
-        return []
-
-    cursor.execute(query, (user_id,))
+    cursor.execute(query, (user_id, cursor_ts, cursor_ts, cursor_id, limit))
     appts = cursor.fetchall()
-    conn.close()
-    return [dict(appt) for appt in appts]
+    return appts
 
-def get_appointment_by_id(appt_id):
-    """Get appointment by ID"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT a.*, 
-               pat.name as patient_name,
-               pat.email as patient_email,
-               prof.aadhar_number,
-               prof.gender,
-               prof.dob,
-               prof.blood_type,
-               prof.weight,
-               prof.height,
-               prof.existing_conditions
-        FROM appointments a
-        JOIN users pat ON a.patient_id = pat.id
-        LEFT JOIN patient_profiles prof ON pat.id = prof.user_id
-        WHERE a.id = ?
-    ''', (appt_id,))
-    appt = cursor.fetchone()
-    conn.close()
-    return dict(appt) if appt else None
+def get_patient_appointments(user_id, cursor_ts=None, cursor_id=None, limit=-1):
+    """Get appointments for a patient, newest first"""
+    return _fetch_appointments(_SQL_PATIENT_APPOINTMENTS, user_id, cursor_ts, cursor_id, limit)
 
-def update_appointment_status(appt_id, status):
-    """Update appointment status"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE appointments SET status = ? WHERE id = ?', (status, appt_id))
-    conn.commit()
-    conn.close()
+def get_doctor_appointments(user_id, cursor_ts=None, cursor_id=None, limit=-1):
+    """Get appointments for a practitioner, oldest first"""
+    return _fetch_appointments(_SQL_DOCTOR_APPOINTMENTS, user_id, cursor_ts, cursor_id, limit)
+
+def get_hospital_appointments(user_id, cursor_ts=None, cursor_id=None, limit=-1):
+    """Get appointments for a hospital, oldest first"""
+    return _fetch_appointments(_SQL_HOSPITAL_APPOINTMENTS, user_id, cursor_ts, cursor_id, limit)
+
+_APPOINTMENT_GETTERS = {
+    'patient': get_patient_appointments,
+    'practitioner': get_doctor_appointments,
+    'hospital': get_hospital_appointments,
+}
+
+def get_appointments_by_user(user_id, role, cursor_ts=None, cursor_id=None, limit=-1):
+    """Get appointments for a user based on role"""
+    getter = _APPOINTMENT_GETTERS.get(role)
+    return getter(user_id, cursor_ts, cursor_id, limit) if getter else []
+
+_APPOINTMENT_QUERIES = {
+    'patient': _SQL_PATIENT_APPOINTMENTS,
+    'practitioner': _SQL_DOCTOR_APPOINTMENTS,
+    'hospital': _SQL_HOSPITAL_APPOINTMENTS,
+}
+
+def iter_appointments_by_user(user_id, role, cursor_ts=None, cursor_id=None, limit=-1):
+    """Iterate over appointments for a user based on role"""
+    query = _APPOINTMENT_QUERIES.get(role)
+    if query is None:
+        return iter(())
+    return _iter_rows(query, (user_id, cursor_ts, cursor_ts, cursor_id, limit))
 
 # Medical Record operations
+_SQL_CREATE_MEDICAL_RECORD = '''
+    INSERT INTO medical_records (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash, delivery_required, delivery_address)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
 def create_medical_record(appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash, delivery_required=False, delivery_address=None):
     """Create medical record"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO medical_records (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash, delivery_required, delivery_address)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash, delivery_required, delivery_address))
+    cursor.execute(_SQL_CREATE_MEDICAL_RECORD, (appointment_id, diagnosis_text, prescription_text, doctor_signature, blockchain_hash, delivery_required, delivery_address))
     conn.commit()
     record_id = cursor.lastrowid
-    conn.close()
+    release_db(conn)
     return record_id
 
+_SQL_MEDICAL_RECORDS_BY_PATIENT = '''
+    SELECT mr.*, a.date_time, doc.name as doctor_name, hosp.name as hospital_name
+    FROM medical_records mr
+    JOIN appointments a ON mr.appointment_id = a.id
+    JOIN users doc ON a.doctor_id = doc.id
+    JOIN users hosp ON a.hospital_id = hosp.id
+    WHERE a.patient_id = ?
+    ORDER BY a.date_time DESC
+'''
+
 def get_medical_records_by_patient(patient_id):
     """Get all medical records for a patient"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.*, a.date_time, doc.name as doctor_name, hosp.name as hospital_name
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        JOIN users doc ON a.doctor_id = doc.id
-        JOIN users hosp ON a.hospital_id = hosp.id
-        WHERE a.patient_id = ?
-        ORDER BY a.date_time DESC
-    ''', (patient_id,))
+    cursor.execute(_SQL_MEDICAL_RECORDS_BY_PATIENT, (patient_id,))
     records = cursor.fetchall()
-    conn.close()
-    return [dict(rec) for rec in records]
+    return records
+
+# Rotating keys updates the row in place rather than deleting and reinserting it
+_SQL_STORE_USER_KEYS = '''
+    INSERT INTO user_keys (user_id, private_key, public_key) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET private_key = excluded.private_key,
+                                       public_key = excluded.public_key
+'''
 
 def store_user_keys(user_id, private_key, public_key):
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('INSERT OR REPLACE INTO user_keys (user_id, private_key, public_key) VALUES (?, ?, ?)',
-                   (user_id, private_key, public_key))
+    cursor.execute(_SQL_STORE_USER_KEYS, (user_id, private_key, public_key))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+_SQL_GET_USER_KEYS = 'SELECT private_key, public_key FROM user_keys WHERE user_id = ?'
 
 def get_user_keys(user_id):
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT private_key, public_key FROM user_keys WHERE user_id = ?', (user_id,))
+    cursor.execute(_SQL_GET_USER_KEYS, (user_id,))
     keys = cursor.fetchone()
-    conn.close()
     return keys
 
+_SQL_MEDICAL_RECORD_BY_APPOINTMENT = 'SELECT * FROM medical_records WHERE appointment_id = ?'
+
 def get_medical_record_by_appointment(appointment_id):
     """Get medical record for an appointment"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM medical_records WHERE appointment_id = ?', (appointment_id,))
+    cursor.execute(_SQL_MEDICAL_RECORD_BY_APPOINTMENT, (appointment_id,))
     record = cursor.fetchone()
-    conn.close()
-    return dict(record) if record else None
-
-def get_patient_history(patient_id):
-    """Get full medical history for a patient"""
-    conn = get_db()
+    return record
+
+_SQL_PATIENT_HISTORY = '''
+    SELECT mr.*, 
+           a.date_time, 
+           a.department,
+           doc.name as doctor_name,
+           hosp.name as hospital_name
+    FROM medical_records mr
+    JOIN appointments a ON mr.appointment_id = a.id
+    JOIN users doc ON a.doctor_id = doc.id
+    JOIN users hosp ON a.hospital_id = hosp.id
+    WHERE a.patient_id = ? AND (? IS NULL OR (a.date_time, mr.id) < (?, ?))
+    ORDER BY a.date_time DESC, mr.id DESC
+    LIMIT ?
+'''
+
+# Walks idx_appt_patient backwards, so rows come out already in date order
+# and a limited page stops early; only records sharing a timestamp get sorted
+def get_patient_history(patient_id, cursor_ts=None, cursor_id=None, limit=-1):
+    """Get medical history for a patient, newest first
+
+    Pages by keyset like the appointment lists: pass the date_time and id of
+    the last record shown to continue after it.
+    """
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.*, 
-               a.date_time, 
-               a.department,
-               doc.name as doctor_name,
-               hosp.name as hospital_name
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        JOIN users doc ON a.doctor_id = doc.id
-        JOIN users hosp ON a.hospital_id = hosp.id
-        WHERE a.patient_id = ?
-        ORDER BY a.date_time DESC
-    ''', (patient_id,))
+    cursor.execute(_SQL_PATIENT_HISTORY, (patient_id, cursor_ts, cursor_ts, cursor_id, limit))
     records = cursor.fetchall()
-    conn.close()
-    return [dict(rec) for rec in records]
+    return records
+
+_SQL_PHARMA_PRESCRIPTIONS = '''
+    SELECT mr.*, 
+           pat.name as patient_name,
+           doc.name as doctor_name,
+           a.date_time
+    FROM medical_records mr
+    JOIN appointments a ON mr.appointment_id = a.id
+    JOIN users pat ON a.patient_id = pat.id
+    JOIN users doc ON a.doctor_id = doc.id
+    WHERE mr.prescription_text IS NOT NULL AND mr.prescription_text != ''
+    ORDER BY a.date_time DESC
+'''
 
 def get_pharma_prescriptions():
     """Get all prescriptions for pharma to process"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.*, 
-               pat.name as patient_name,
-               doc.name as doctor_name,
-               a.date_time
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        JOIN users pat ON a.patient_id = pat.id
-        JOIN users doc ON a.doctor_id = doc.id
-        WHERE mr.prescription_text IS NOT NULL AND mr.prescription_text != ''
-        ORDER BY a.date_time DESC
-    ''')
+    cursor.execute(_SQL_PHARMA_PRESCRIPTIONS)
     records = cursor.fetchall()
-    conn.close()
-    return [dict(rec) for rec in records]
-
-def get_medical_records_by_patient(patient_id):
-    """Get all medical records for a patient"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.*, a.date_time, u.name as doctor_name
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        JOIN users u ON a.doctor_id = u.id
-        WHERE a.patient_id = ?
-        ORDER BY a.date_time DESC
-    ''', (patient_id,))
-    records = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in records]
+    return records
+
+# Each dashboard's appointment counts come from one pass over the user's
+# appointments index range; FILTER keeps empty counts at 0 rather than NULL
+_SQL_HOSPITAL_STATS = '''
+    SELECT COUNT(*) AS total_appointments,
+           COUNT(*) FILTER (WHERE status = 'completed') AS completed_appointments,
+           COUNT(*) FILTER (WHERE status = 'scheduled') AS scheduled_appointments,
+           COUNT(DISTINCT patient_id) AS total_patients
+    FROM appointments
+    WHERE hospital_id = ?
+'''
 
 def get_hospital_stats(hospital_id):
     """Get statistics for hospital dashboard"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    
-    stats = {}
-    
-    # Total appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE hospital_id = ?", (hospital_id,))
-    stats['total_appointments'] = cursor.fetchone()['count']
-    
-    # Completed appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE hospital_id = ? AND status = 'completed'", (hospital_id,))
-    stats['completed_appointments'] = cursor.fetchone()['count']
-    
-    # Scheduled appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE hospital_id = ? AND status = 'scheduled'", (hospital_id,))
-    stats['scheduled_appointments'] = cursor.fetchone()['count']
-    
-    # Unique patients
-    cursor.execute("SELECT COUNT(DISTINCT patient_id) as count FROM appointments WHERE hospital_id = ?", (hospital_id,))
-    stats['total_patients'] = cursor.fetchone()['count']
-    
-    conn.close()
-    return stats
+    cursor.execute(_SQL_HOSPITAL_STATS, (hospital_id,))
+    return cursor.fetchone()
+
+_SQL_PRACTITIONER_STATS = '''
+    SELECT COUNT(*) AS total_appointments,
+           COUNT(*) FILTER (WHERE status = 'completed') AS completed_appointments,
+           COUNT(DISTINCT patient_id) AS total_patients,
+           COUNT(*) FILTER (WHERE status = 'scheduled') AS pending_appointments
+    FROM appointments
+    WHERE doctor_id = ?
+'''
 
 def get_practitioner_stats(user_id):
     """Get statistics for practitioner dashboard"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    
-    stats = {}
-    
-    # Total appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE doctor_id = ?", (user_id,))
-    stats['total_appointments'] = cursor.fetchone()['count']
-    
-    # Completed appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE doctor_id = ? AND status = 'completed'", (user_id,))
-    stats['completed_appointments'] = cursor.fetchone()['count']
-    
-    # Unique patients
-    cursor.execute("SELECT COUNT(DISTINCT patient_id) as count FROM appointments WHERE doctor_id = ?", (user_id,))
-    stats['total_patients'] = cursor.fetchone()['count']
-    
-    # Pending appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE doctor_id = ? AND status = 'scheduled'", (user_id,))
-    stats['pending_appointments'] = cursor.fetchone()['count']
-    
-    conn.close()
-    return stats
+    cursor.execute(_SQL_PRACTITIONER_STATS, (user_id,))
+    return cursor.fetchone()
+
+def get_practitioner_dashboard(user_id, recent_n=-1):
+    """Get a practitioner's stats and appointments in one read transaction
+
+    Both queries run back to back on this thread's read connection, so they
+    see the same snapshot and share a warm page cache. recent_n caps the
+    appointment list like the getters' limit; -1 returns every appointment.
+    Returns (stats, appointments).
+    """
+    conn = get_db_ro()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute(_SQL_PRACTITIONER_STATS, (user_id,))
+        stats = cursor.fetchone()
+        cursor.execute(_SQL_DOCTOR_APPOINTMENTS, (user_id, None, None, None, recent_n))
+        appointments = cursor.fetchall()
+    finally:
+        conn.rollback()
+    return stats, appointments
+
+# The records count rides along as a scalar subquery; it walks the same
+# patient index range and probes idx_mr_appt per appointment
+_SQL_PATIENT_STATS = '''
+    SELECT COUNT(*) AS total_appointments,
+           COUNT(*) FILTER (WHERE status = 'scheduled') AS upcoming_appointments,
+           COUNT(*) FILTER (WHERE status = 'completed') AS completed_visits,
+           (SELECT COUNT(*)
+            FROM medical_records mr
+            JOIN appointments a ON mr.appointment_id = a.id
+            WHERE a.patient_id = ?1) AS total_records
+    FROM appointments
+    WHERE patient_id = ?1
+'''
 
 def get_patient_stats(user_id):
     """Get statistics for patient dashboard"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    
-    stats = {}
-    
-    # Total appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE patient_id = ?", (user_id,))
-    stats['total_appointments'] = cursor.fetchone()['count']
-    
-    # Upcoming appointments
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE patient_id = ? AND status = 'scheduled'", (user_id,))
-    stats['upcoming_appointments'] = cursor.fetchone()['count']
-    
-    # Completed visits
-    cursor.execute("SELECT COUNT(*) as count FROM appointments WHERE patient_id = ? AND status = 'completed'", (user_id,))
-    stats['completed_visits'] = cursor.fetchone()['count']
-    
-    # Total medical records
-    cursor.execute("""
-        SELECT COUNT(*) as count 
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        WHERE a.patient_id = ?
-    """, (user_id,))
-    stats['total_records'] = cursor.fetchone()['count']
-    
-    conn.close()
-    return stats
+    cursor.execute(_SQL_PATIENT_STATS, (user_id,))
+    return cursor.fetchone()
 
 # ============================================================
 # AI ASSISTANT SUPPORT FUNCTIONS
 # ============================================================
 
+_SQL_DOCTORS_BY_DEPARTMENT = '''
+    SELECT id, name, email, practitioner_type 
+    FROM users 
+    WHERE role = 'practitioner' AND practitioner_type_lc LIKE ?
+'''
+
+_SQL_ALL_DOCTORS = '''
+    SELECT id, name, email, practitioner_type 
+    FROM users 
+    WHERE role = 'practitioner'
+'''
+
+# The full practitioner list backs every unmatched department lookup from the
+# AI assistant, so it is cached briefly and dropped when practitioners change
+PRACTITIONERS_TTL = 30  # seconds
+_practitioners_cache = {}  # DB path -> (expires, doctors)
+
+def _invalidate_practitioners_cache():
+    _practitioners_cache.clear()
+
+def _all_practitioners():
+    cached = _practitioners_cache.get(str(DB_PATH))
+    if cached and cached[0] > time.monotonic():
+        return list(cached[1])
+    
+    conn = get_db_ro()
+    cursor = conn.cursor()
+    cursor.execute(_SQL_ALL_DOCTORS)
+    doctors = cursor.fetchall()
+    _practitioners_cache[str(DB_PATH)] = (time.monotonic() + PRACTITIONERS_TTL, doctors)
+    return list(doctors)
+
 def get_available_doctors(department=None):
     """Get list of available doctors, optionally filtered by department"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if department:
         # Try case-insensitive search
-        cursor.execute('''
-            SELECT id, name, email, practitioner_type 
-            FROM users 
-            WHERE role = 'practitioner' AND LOWER(practitioner_type) LIKE LOWER(?)
-        ''', (f'%{department}%',))
-        doctors = cursor.fetchall()
-        
-        # If no match, return all doctors
-        if not doctors:
-            cursor.execute('''
-                SELECT id, name, email, practitioner_type 
-                FROM users 
-                WHERE role = 'practitioner'
-            ''')
-            doctors = cursor.fetchall()
-    else:
-        cursor.execute('''
-            SELECT id, name, email, practitioner_type 
-            FROM users 
-            WHERE role = 'practitioner'
-        ''')
+        conn = get_db_ro()
+        cursor = conn.cursor()
+        cursor.execute(_SQL_DOCTORS_BY_DEPARTMENT, (f'%{department.lower()}%',))
         doctors = cursor.fetchall()
+        if doctors:
+            return doctors
     
-    conn.close()
-    return [dict(doc) for doc in doctors]
+    # No department, or no match: return all doctors
+    return _all_practitioners()
+
+# Names and emails of appointment parties rarely change, so get_appointment_by_id
+# resolves them from a per-database map instead of joining users three times.
+# The appointment query also reads user_names_version; when the triggers have
+# bumped it, from this process or any other, the map starts over
+USER_NAMES_CACHE_SIZE = 4096
+_user_names = {}  # DB path -> (version, {user_id: (name, email)})
+
+_SQL_USER_NAME = 'SELECT name, email FROM users WHERE id = ?'
+
+def _user_name(conn, names, user_id):
+    """Return (name, email) for a user id, or (None, None) if there is none"""
+    if user_id is None:
+        return None, None
+    entry = names.get(user_id)
+    if entry is None:
+        user = conn.execute(_SQL_USER_NAME, (user_id,)).fetchone()
+        if user is None:
+            return None, None
+        if len(names) >= USER_NAMES_CACHE_SIZE:
+            names.clear()
+        entry = names[user_id] = (user['name'], user['email'])
+    return entry
+
+_SQL_GET_APPOINTMENT_BY_ID = '''
+    SELECT a.*, 
+           prof.aadhar_number,
+           prof.gender,
+           prof.dob,
+           prof.blood_type,
+           prof.weight,
+           prof.height,
+           prof.existing_conditions,
+           (SELECT version FROM user_names_version) AS user_names_version
+    FROM appointments a
+    LEFT JOIN patient_profiles prof ON a.patient_id = prof.user_id
+    WHERE a.id = ?
+'''
 
 def get_appointment_by_id(appointment_id):
     """Get appointment by ID with full details"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT a.*, 
-               pat.name as patient_name,
-               doc.name as doctor_name,
-               hosp.name as hospital_name
-        FROM appointments a
-        LEFT JOIN users pat ON a.patient_id = pat.id
-        LEFT JOIN users doc ON a.doctor_id = doc.id
-        LEFT JOIN users hosp ON a.hospital_id = hosp.id
-        WHERE a.id = ?
-    ''', (appointment_id,))
+    cursor.execute(_SQL_GET_APPOINTMENT_BY_ID, (appointment_id,))
     appt = cursor.fetchone()
-    conn.close()
-    return dict(appt) if appt else None
+    if appt:
+        # Names are read after the version, so they are never older than it
+        version = appt.pop('user_names_version')
+        cached = _user_names.get(str(DB_PATH))
+        if cached is None or cached[0] != version:
+            cached = _user_names[str(DB_PATH)] = (version, {})
+        names = cached[1]
+        appt['patient_name'], appt['patient_email'] = _user_name(conn, names, appt['patient_id'])
+        appt['doctor_name'] = _user_name(conn, names, appt['doctor_id'])[0]
+        appt['hospital_name'] = _user_name(conn, names, appt['hospital_id'])[0]
+    return appt
+
+_SQL_UPDATE_APPOINTMENT_DATETIME = '''
+    UPDATE appointments 
+    SET date_time = ?
+    WHERE id = ?
+'''
 
 def update_appointment_datetime(appointment_id, new_datetime):
     """Update appointment date/time"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE appointments 
-        SET date_time = ?
-        WHERE id = ?
-    ''', (new_datetime, appointment_id))
+    cursor.execute(_SQL_UPDATE_APPOINTMENT_DATETIME, (new_datetime, appointment_id))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+_SQL_UPDATE_APPOINTMENT_STATUS = '''
+    UPDATE appointments 
+    SET status = ?
+    WHERE id = ?
+'''
 
 def update_appointment_status(appointment_id, status):
     """Update appointment status"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE appointments 
-        SET status = ?
-        WHERE id = ?
-    ''', (status, appointment_id))
+    cursor.execute(_SQL_UPDATE_APPOINTMENT_STATUS, (status, appointment_id))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+# Hourly slots from 9 AM to 5 PM (simplified - in real app, would check doctor
+# schedule) minus the doctor's bookings, generated entirely in SQL. The day is
+# a date_time range so idx_appt_doctor can seek it, and bookings are
+# normalised with datetime() so 'T'-separated times match too
+_SQL_AVAILABLE_SLOTS = '''
+    WITH RECURSIVE hours(h) AS (
+        SELECT 9 UNION ALL SELECT h + 1 FROM hours WHERE h < 16
+    )
+    SELECT printf('%s %02d:00:00', ?2, h) AS slot FROM hours
+    EXCEPT
+    SELECT datetime(date_time)
+    FROM appointments 
+    WHERE doctor_id = ?1 AND status != 'cancelled'
+      AND date_time >= date(?2) AND date_time < date(?2, '+1 day')
+    ORDER BY slot
+'''
 
 def get_available_appointment_slots(doctor_id, date):
     """Get available time slots for a doctor on a given date"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    
-    # Get existing appointments for the doctor on that date
-    cursor.execute('''
-        SELECT date_time 
-        FROM appointments 
-        WHERE doctor_id = ? AND date(date_time) = date(?) AND status != 'cancelled'
-    ''', (doctor_id, date))
-    
-    booked_slots = [row['date_time'] for row in cursor.fetchall()]
-    conn.close()
-    
-    # Generate available slots (simplified - in real app, would check doctor schedule)
-    available_slots = []
-    for hour in range(9, 17):  # 9 AM to 5 PM
-        slot_time = f"{date} {hour:02d}:00:00"
-        if slot_time not in booked_slots:
-            available_slots.append(slot_time)
-    
-    return available_slots
+    cursor.execute(_SQL_AVAILABLE_SLOTS, (doctor_id, date))
+    return [row['slot'] for row in cursor.fetchall()]
+
+_SQL_CREATE_AI_ACTION_LOG = '''
+    INSERT INTO ai_action_logs (user_id, action_type, action_data, status)
+    VALUES (?, ?, ?, ?)
+'''
 
 def create_ai_action_log(user_id, action_type, action_data, status='pending'):
     """Log AI-initiated actions for audit trail"""
     conn = get_db()
     cursor = conn.cursor()
-    
-    # Create ai_action_logs table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ai_action_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            action_type TEXT NOT NULL,
-            action_data TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    cursor.execute('''
-        INSERT INTO ai_action_logs (user_id, action_type, action_data, status)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, action_type, json.dumps(action_data), status))
-    
+    cursor.execute(_SQL_CREATE_AI_ACTION_LOG, (user_id, action_type, _json_dumpb(action_data), status))
     conn.commit()
     log_id = cursor.lastrowid
-    conn.close()
+    release_db(conn)
     return log_id
 
+# completed_at defaults to SQLite's UTC CURRENT_TIMESTAMP, matching created_at
+_SQL_UPDATE_AI_ACTION_LOG = '''
+    UPDATE ai_action_logs 
+    SET status = ?, completed_at = COALESCE(?, CURRENT_TIMESTAMP)
+    WHERE id = ?
+'''
+
 def update_ai_action_log(log_id, status, completed_at=None):
     """Update AI action log status"""
     conn = get_db()
     cursor = conn.cursor()
-    
-    if completed_at is None:
-        completed_at = datetime.now()
-    
-    cursor.execute('''
-        UPDATE ai_action_logs 
-        SET status = ?, completed_at = ?
-        WHERE id = ?
-    ''', (status, completed_at, log_id))
-    
+    cursor.execute(_SQL_UPDATE_AI_ACTION_LOG, (status, completed_at, log_id))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+_SQL_LOW_STOCK_ITEMS = '''
+    SELECT * FROM inventory 
+    WHERE stock < ?
+    ORDER BY stock ASC
+'''
 
 def get_low_stock_items(threshold=20):
     """Get inventory items below stock threshold"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM inventory 
-        WHERE stock < ?
-        ORDER BY stock ASC
-    ''', (threshold,))
+    cursor.execute(_SQL_LOW_STOCK_ITEMS, (threshold,))
     items = cursor.fetchall()
-    conn.close()
-    return [dict(item) for item in items]
+    return items
+
+_SQL_UPDATE_PHARMA_STATUS = '''
+    UPDATE medical_records 
+    SET pharma_status = ?
+    WHERE id = ?
+'''
 
 def update_pharma_status(record_id, status):
     """Update pharma processing status"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE medical_records 
-        SET pharma_status = ?
-        WHERE id = ?
-    ''', (status, record_id))
+    cursor.execute(_SQL_UPDATE_PHARMA_STATUS, (status, record_id))
     conn.commit()
-    conn.close()
+    release_db(conn)
+
+# Walks only the prescribed records (idx_mr_prescribed), then sorts them
+_SQL_RECENT_PRESCRIPTIONS = '''
+    SELECT mr.prescription_text, a.date_time
+    FROM medical_records mr
+    JOIN appointments a ON mr.appointment_id = a.id
+    WHERE mr.prescription_text IS NOT NULL AND mr.prescription_text != ''
+    ORDER BY a.date_time DESC
+    LIMIT ?
+'''
 
 def get_recent_prescriptions(limit=50):
     """Get recent prescriptions for demand forecasting"""
-    conn = get_db()
+    conn = get_db_ro()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mr.prescription_text, a.date_time
-        FROM medical_records mr
-        JOIN appointments a ON mr.appointment_id = a.id
-        WHERE mr.prescription_text IS NOT NULL AND mr.prescription_text != ''
-        ORDER BY a.date_time DESC
-        LIMIT ?
-    ''', (limit,))
+    cursor.execute(_SQL_RECENT_PRESCRIPTIONS, (limit,))
     records = cursor.fetchall()
-    conn.close()
-    return [dict(rec) for rec in records]
+    return records
 
 if __name__ == '__main__':
     init_db()
@@ -11,40 +11,32 @@ def init_test_data():
     print("Initializing database...")
     db.init_db()
     
-    # Create admin user
-    admin_id = db.create_user(
-        email='admin@healthcredx.com',
-        password=auth.hash_password('admin123'),
-        name='Admin User',
-        role='admin'
-    )
+    # (email, password, name, role, practitioner_type, organization_name, label)
+    test_users = [
+        ('admin@healthcredx.com', 'admin123', 'Admin User', 'admin', None, None, 'admin user'),
+        ('hospital@example.com', 'hospital123', 'Medical Verifier', 'organization', None,
+         'City Medical Center', 'organization'),
+        ('doctor@example.com', 'doctor123', 'Dr. Jane Smith', 'practitioner', 'Doctor', None,
+         'practitioner'),
+    ]
     
-    if admin_id:
-        print(f"✓ Created admin user: admin@healthcredx.com / admin123")
+    # Hash up front, then insert every account in one transaction; RETURNING
+    # reports which emails were new
+    rows = [(email, auth.hash_password(password), name, role, practitioner_type, organization_name)
+            for email, password, name, role, practitioner_type, organization_name, _ in test_users]
+    placeholders = ', '.join(['(?, ?, ?, ?, ?, ?)'] * len(rows))
+    with db.batch_writes() as conn:
+        cursor = conn.execute(f'''
+            INSERT INTO users (email, password, name, role, practitioner_type, organization_name)
+            VALUES {placeholders}
+            ON CONFLICT(email) DO NOTHING
+            RETURNING email
+        ''', [value for row in rows for value in row])
+        created = {row['email'] for row in cursor.fetchall()}
     
-    # Create sample organization
-    org_id = db.create_user(
-        email='hospital@example.com',
-        password=auth.hash_password('hospital123'),
-        name='Medical Verifier',
-        role='organization',
-        organization_name='City Medical Center'
-    )
-    
-    if org_id:
-        print(f"✓ Created organization: hospital@example.com / hospital123")
-    
-    # Create sample practitioner
-    prac_id = db.create_user(
-        email='doctor@example.com',
-        password=auth.hash_password('doctor123'),
-        name='Dr. Jane Smith',
-        role='practitioner',
-        practitioner_type='Doctor'
-    )
-    
-    if prac_id:
-        print(f"✓ Created practitioner: doctor@example.com / doctor123")
+    for email, password, *_, label in test_users:
+        if email in created:
+            print(f"✓ Created {label}: {email} / {password}")
     
     print("\n" + "=" * 60)
     print("Database initialized successfully!")
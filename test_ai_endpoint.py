@@ -5,12 +5,15 @@ Run this while the app is running to test the endpoint directly
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 BASE_URL = "http://127.0.0.1:5001"
 
-# Create a session and login
+# Create a session and login; the mounted adapter keeps connections to the
+# app alive across requests
 session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
 
 print("Logging in as patient...")
 login_response = session.post(f"{BASE_URL}/login", data={
@@ -3,10 +3,14 @@ import os
 import tempfile
 from app import app, db, blockchain
 import database
+from testing_utils import login_as
 
 class HealthCredXExpansionTest(unittest.TestCase):
     def setUp(self):
-        self.db_fd, self.db_path = tempfile.mkstemp()
+        # A fresh database file per test, on tmpfs where available so commits
+        # never wait on a disk
+        tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self.db_fd, self.db_path = tempfile.mkstemp(suffix='.db', dir=tmp_dir)
         app.config['TESTING'] = True
         app.config['DATABASE'] = self.db_path
         
@@ -19,8 +23,18 @@ class HealthCredXExpansionTest(unittest.TestCase):
             database.init_db()
 
     def tearDown(self):
+        database.close_all()
         os.close(self.db_fd)
-        os.unlink(self.db_path)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.unlink(self.db_path + suffix)
+
+    def login(self, email):
+        """Sign the client in without the password hash check that POST
+        /login would run; returns the user"""
+        user = database.get_user_by_email(email)
+        login_as(self.client, user)
+        return user
 
     def test_full_flow(self):
         # 1. Register Hospital
@@ -35,7 +49,7 @@ class HealthCredXExpansionTest(unittest.TestCase):
         self.assertIn(b'Registration successful', resp.data)
 
         # Login Hospital
-        self.client.post('/login', data={'email': 'hospital@test.com', 'password': 'password'}, follow_redirects=True)
+        self.login('hospital@test.com')
         
         # 2. Onboard Patient
         print("--- Testing Patient Onboarding ---")
@@ -66,7 +80,7 @@ class HealthCredXExpansionTest(unittest.TestCase):
 
         # 4. Schedule Appointment (Hospital)
         print("--- Testing Appointment Scheduling ---")
-        self.client.post('/login', data={'email': 'hospital@test.com', 'password': 'password'}, follow_redirects=True)
+        self.login('hospital@test.com')
         resp = self.client.post('/hospital/schedule-appointment', data={
             'patient_email': 'patient@test.com',
             'doctor_email': 'doctor@test.com',
@@ -78,13 +92,10 @@ class HealthCredXExpansionTest(unittest.TestCase):
         # 5. Doctor Visit (Diagnosis & Prescription)
         print("--- Testing Doctor Visit & Blockchain ---")
         self.client.get('/logout')
-        self.client.post('/login', data={'email': 'doctor@test.com', 'password': 'password'}, follow_redirects=True)
+        doctor = self.login('doctor@test.com')
         
-        # Get appointment ID
-        with app.app_context():
-            doctor = database.get_user_by_email('doctor@test.com')
-            appts = database.get_appointments_by_user(doctor['id'], 'practitioner')
-            appt_id = appts[0]['id']
+        # Get appointment ID (the database layer needs no app context)
+        appt_id = database.get_appointments_by_user(doctor['id'], 'practitioner', limit=1)[0]['id']
 
         resp = self.client.post(f'/practitioner/visit/{appt_id}', data={
             'diagnosis': 'Mild Hypertension',
@@ -105,7 +116,7 @@ class HealthCredXExpansionTest(unittest.TestCase):
         # 6. Patient View & Chatbot
         print("--- Testing Patient View & Chatbot ---")
         self.client.get('/logout')
-        self.client.post('/login', data={'email': 'patient@test.com', 'password': 'password'}, follow_redirects=True)
+        self.login('patient@test.com')
         resp = self.client.get('/patient/dashboard')
         self.assertIn(b'Mild Hypertension', resp.data)
         self.assertIn(b'Lisinopril 10mg', resp.data)
@@ -128,7 +139,7 @@ class HealthCredXExpansionTest(unittest.TestCase):
             'organization_name': 'City Pharma Inc'
         }, follow_redirects=True)
         
-        self.client.post('/login', data={'email': 'pharma@test.com', 'password': 'password'}, follow_redirects=True)
+        self.login('pharma@test.com')
         resp = self.client.get('/pharma/dashboard')
         self.assertIn(b'Lisinopril 10mg', resp.data)
 
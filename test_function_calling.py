@@ -2,51 +2,24 @@
 """Test Gemini function calling to debug the issue"""
 
 import os
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
 import google.generativeai as genai
 
-# Configure
-genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+# Configure; gRPC runs both probes over one HTTP/2 connection, so the
+# second request doesn't pay for another TLS handshake
+genai.configure(api_key=os.environ.get('GEMINI_API_KEY'), transport='grpc')
 
 print("Testing Gemini Function Calling...")
 print("=" * 60)
 
-# Test 1: Simple function with Python function
-print("\nTest 1: Using Python function directly")
 def multiply(a: float, b: float):
     """Multiply two numbers"""
     return a * b
 
-try:
-    model = genai.GenerativeModel(
-        model_name='gemini-2.5-flash',
-        tools=[multiply]
-    )
-    
-    result = model.generate_content('What is 12 times 8?')
-    print(f"✓ Model created and responded")
-    print(f"Response has text: {hasattr(result, 'text')}")
-    if hasattr(result, 'text'):
-        print(f"Text: {result.text}")
-    
-    if result.candidates:
-        part = result.candidates[0].content.parts[0]
-        if hasattr(part, 'function_call'):
-            print(f"✓ Got function call: {part.function_call.name}")
-            print(f"  Args: {dict(part.function_call.args)}")
-        else:
-            print("  No function call in response")
-except Exception as e:
-    print(f"❌ Error: {e}")
-    import traceback
-    traceback.print_exc()
-
-# Test 2: Using dictionary declaration  
-print("\n" + "=" * 60)
-print("Test 2: Using dictionary function declaration")
-
 schedule_func = {
     'name': 'schedule_appointment',
     'description': 'Schedule a medical appointment for the patient',
@@ -70,13 +43,21 @@ schedule_func = {
     }
 }
 
-try:
-    model2 = genai.GenerativeModel(
-        model_name='gemini-2.5-flash',
-        tools=[schedule_func]
-    )
+def report_python_function(result):
+    print(f"✓ Model created and responded")
+    print(f"Response has text: {hasattr(result, 'text')}")
+    if hasattr(result, 'text'):
+        print(f"Text: {result.text}")
     
-    result2 = model2.generate_content('I need to schedule a cardiology appointment for chest pain next Tuesday')
+    if result.candidates:
+        part = result.candidates[0].content.parts[0]
+        if hasattr(part, 'function_call'):
+            print(f"✓ Got function call: {part.function_call.name}")
+            print(f"  Args: {dict(part.function_call.args)}")
+        else:
+            print("  No function call in response")
+
+def report_dict_declaration(result2):
     print(f"✓ Model created and responded")
     
     if result2.candidates:
@@ -92,11 +73,35 @@ try:
             print(f"Text response: {part.text}")
         else:
             print(f"Unknown part type: {part}")
-            
-except Exception as e:
-    print(f"❌ Error: {e}")
-    import traceback
-    traceback.print_exc()
+
+def start_probe(pool, tools, prompt):
+    """Build the model and send its prompt; the two probes' requests overlap"""
+    try:
+        model = genai.GenerativeModel(model_name='gemini-2.5-flash', tools=tools)
+        return pool.submit(model.generate_content, prompt)
+    except Exception as e:
+        failed = Future()
+        failed.set_exception(e)
+        return failed
+
+with ThreadPoolExecutor(max_workers=2) as pool:
+    probes = [
+        ("Test 1: Using Python function directly", report_python_function,
+         start_probe(pool, [multiply], 'What is 12 times 8?')),
+        ("Test 2: Using dictionary function declaration", report_dict_declaration,
+         start_probe(pool, [schedule_func],
+                     'I need to schedule a cardiology appointment for chest pain next Tuesday')),
+    ]
+    
+    # Report in order; the second request is already in flight while the
+    # first result prints
+    for i, (title, report, future) in enumerate(probes):
+        print(("\n" + "=" * 60 + "\n" if i else "\n") + title)
+        try:
+            report(future.result())
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            traceback.print_exception(e)
 
 print("\n" + "=" * 60)
 print("Testing complete!")
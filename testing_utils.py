@@ -0,0 +1,20 @@
+"""
+Helpers shared by the Flask test-client suites
+"""
+
+from flask import session
+
+import auth
+
+def login_as(client, user):
+    """Sign a test client in as user without POST /login
+
+    auth.login_user fills a throwaway request's session, which is copied into
+    the client's cookie, so the session always matches a real login while
+    skipping the password hash check.
+    """
+    with client.application.test_request_context():
+        auth.login_user(user)
+        values = dict(session)
+    with client.session_transaction() as sess:
+        sess.update(values)
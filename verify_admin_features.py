@@ -1,47 +1,70 @@
 import unittest
 import os
+import sqlite3
 import tempfile
 from app import app, db
 import database
+from testing_utils import login_as
 import json
 
 class AdminFeaturesTest(unittest.TestCase):
-    def setUp(self):
-        self.db_fd, self.db_path = tempfile.mkstemp()
+    # The tests only read the fixture data, so it is built once per class and
+    # the admin logs in once; the test client keeps the session cookie
+    @classmethod
+    def setUpClass(cls):
+        cls.db_fd, cls.db_path = tempfile.mkstemp()
         app.config['TESTING'] = True
-        app.config['DATABASE'] = self.db_path
+        app.config['DATABASE'] = cls.db_path
         
         from pathlib import Path
-        database.DB_PATH = Path(self.db_path)
+        database.DB_PATH = Path(cls.db_path)
         
-        self.client = app.test_client()
+        cls.client = app.test_client()
         with app.app_context():
             database.init_db()
             
-            # Create test data
+            # Create test data in one transaction
             # 1. Create Admin
             # (Already created by init_db)
-            
-            # 2. Create Practitioner
-            self.practitioner_id = database.create_user('doc@test.com', 'pass', 'Dr. Test', 'practitioner', 'Cardio')
-            
-            # 3. Create Verification
-            self.ver_id = database.create_verification(self.practitioner_id)
-            database.update_verification_status(self.ver_id, 'pending_admin')
-            database.update_verification_ai_analysis(self.ver_id, 85, {"score": 85})
+            with database.batch_writes() as conn:
+                # 2. Create Practitioner
+                cls.practitioner_id = database.create_user('doc@test.com', 'pass', 'Dr. Test', 'practitioner', 'Cardio',
+                                                           conn=conn)
+                
+                # 3. Create Verification
+                cls.ver_id = database.create_verification(cls.practitioner_id, conn=conn)
+                database.update_verification_status(cls.ver_id, 'pending_admin', conn=conn)
+                database.update_verification_ai_analysis(cls.ver_id, 85, {"score": 85}, conn=conn)
+        
+        cls.login_admin()
+        
+        # The app commits on its own pooled connections, so a test can't be
+        # wrapped in a rolled-back SAVEPOINT; instead this connection's
+        # data_version catches any commit that would leak into the next test
+        cls.watch = sqlite3.connect(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.watch.close()
+        database.close_all()
+        os.close(cls.db_fd)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(cls.db_path + suffix):
+                os.unlink(cls.db_path + suffix)
+
+    def setUp(self):
+        self.data_version = self.watch.execute("PRAGMA data_version").fetchone()[0]
 
     def tearDown(self):
-        os.close(self.db_fd)
-        os.unlink(self.db_path)
+        self.assertEqual(self.watch.execute("PRAGMA data_version").fetchone()[0], self.data_version,
+                         "test wrote to the shared fixture database")
 
-    def login_admin(self):
-        return self.client.post('/login', data={
-            'email': 'admin@healthcredx.com',
-            'password': 'admin123'
-        }, follow_redirects=True)
+    @classmethod
+    def login_admin(cls):
+        # Skips POST /login, which would run the password hash check
+        login_as(cls.client, database.get_user_by_email('admin@healthcredx.com'))
 
     def test_admin_dashboard_stats(self):
-        self.login_admin()
         resp = self.client.get('/admin/dashboard')
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b'Dashboard Overview', resp.data)
@@ -50,8 +73,6 @@ class AdminFeaturesTest(unittest.TestCase):
         self.assertIn(b'1', resp.data) 
 
     def test_practitioner_applications(self):
-        self.login_admin()
-        
         # Test Pending Tab
         resp = self.client.get('/admin/applications?status=pending')
         self.assertEqual(resp.status_code, 200)
@@ -62,7 +83,6 @@ class AdminFeaturesTest(unittest.TestCase):
         self.assertNotIn(b'Dr. Test', resp.data)
 
     def test_manage_users(self):
-        self.login_admin()
         resp = self.client.get('/admin/users')
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b'User Management', resp.data)
@@ -71,7 +91,6 @@ class AdminFeaturesTest(unittest.TestCase):
         self.assertNotIn(b'pass', resp.data)
 
     def test_admin_chatbot(self):
-        self.login_admin()
         # Mocking the AI response would be ideal, but for integration test we check if route exists and handles request
         # We expect it might fail if no API key, but it should return a JSON response
         resp = self.client.post('/api/admin/chat', json={'query': 'How many patients?'})